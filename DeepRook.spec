@@ -1,8 +1,19 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+import subprocess
+import sys
+
 # Configuration
 SOURCE_DIR = "./src"
 ICON_PATH = "./resources/icons/app_logo.ico"
+MODEL_PATH = "./resources/models/CNN/RookceptionCNN_V1.h5"
+WEIGHTS_PATH = "./resources/models/CNN/RookceptionCNN_V1.npz"
+
+# Export the NumPy weights (needs TensorFlow here, the app runs without it) and compile the Qt resources with them
+subprocess.run(
+    [sys.executable, "-m", "src.CNNlayer.NumpyModel", MODEL_PATH, "--out", WEIGHTS_PATH, "--verify"], check=True
+)
+subprocess.run(["pyside6-rcc", "./resources/resources.qrc", "-o", "./resources/resources_qrc.py"], check=True)
 
 a = Analysis(
     [os.path.join(SOURCE_DIR, "main.py")],
@@ -0,0 +1,169 @@
+import hashlib
+import os
+
+import numpy as np
+
+from src.utils import utils
+
+
+class InferenceBackend:
+    # Runs the Rookception CNN on a batch of raw tiles: (n, 64, 64, 3) uint8 -> (n, 13) probabilities.
+    # The returned array may be a buffer that the next predict() call overwrites.
+    name = ""
+
+    def __init__(self):
+        self._input_buffer = np.empty((0, 64, 64, 3), dtype=np.float32)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _normalize(self, batch: np.ndarray) -> np.ndarray:
+        # Scales uint8 tiles to [0, 1] into a reused float32 buffer, float batches are taken as already normalized
+        if batch.dtype != np.uint8:
+            return batch
+        if len(self._input_buffer) < len(batch) or self._input_buffer.shape[1:] != batch.shape[1:]:
+            self._input_buffer = np.empty((max(len(batch), 16), *batch.shape[1:]), dtype=np.float32)
+        return np.multiply(batch, np.float32(1 / 255.0), out=self._input_buffer[: len(batch)])
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(self, model_path: str):
+        from tensorflow.keras.models import load_model  # Lazy import
+
+        super().__init__()
+        self.model = load_model(model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(self._normalize(batch), verbose=0)
+
+
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def __init__(self, model_path: str, tflite_path: str | None = None):
+        super().__init__()
+        tflite_path = tflite_path or get_tflite_path(model_path)
+        if not os.path.exists(tflite_path):
+            export_tflite(model_path, tflite_path)
+
+        interpreter_cls = load_tflite_interpreter()
+        self.interpreter = interpreter_cls(model_path=tflite_path, num_threads=os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self._input_index = self.interpreter.get_input_details()[0]["index"]
+        self._output_index = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # The interpreter has static shapes, only re-allocate when the batch size changes
+        if batch.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch.shape[0]
+
+        self.interpreter.set_tensor(self._input_index, self._normalize(batch))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output_index)
+
+
+class TFLiteInt8Backend(TFLiteBackend):
+    # Int8 post-training quantized model, produced from calibration boards by Quantization.py
+    name = "tflite-int8"
+
+    def __init__(self, model_path: str):
+        tflite_path = get_int8_path(model_path)
+        if not os.path.exists(tflite_path):
+            raise FileNotFoundError(f"No int8 model at {tflite_path}, run src.CNNlayer.Quantization first")
+        super().__init__(model_path, tflite_path)
+
+
+class NumpyBackend(InferenceBackend):
+    # TensorFlow-free forward pass over weights exported from the .h5 (see NumpyModel.py), normally shipped with the
+    # app. The 1/255 input scale is folded into the first layer, float batches are scaled back up to match.
+    name = "numpy"
+
+    def __init__(self, model_path: str, weights_path: str | None = None):
+        from src.CNNlayer.NumpyModel import NumpyModel, export_weights
+
+        super().__init__()
+        weights_path = weights_path or get_weights_path(model_path)
+        digest = get_model_digest(model_path)
+        model = NumpyModel(weights_path, input_scale=1 / 255.0) if os.path.exists(weights_path) else None
+        if model is None or model.source_digest != digest:
+            try:
+                export_weights(model_path, weights_path, digest)
+            except ImportError as e:
+                raise RuntimeError(
+                    f"No NumPy weights for this model at {weights_path} and TensorFlow isn't installed to export them"
+                ) from e
+            model = NumpyModel(weights_path, input_scale=1 / 255.0)
+        self.model = model
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if batch.dtype != np.uint8:
+            batch = np.multiply(batch, 255.0, dtype=np.float32)  # Normalized tiles, e.g. Quantization's references
+        return self.model.predict(batch)
+
+
+# Ordered by fallback: a backend that fails to load falls back to the ones after it
+BACKENDS = {
+    TFLiteInt8Backend.name: TFLiteInt8Backend,
+    NumpyBackend.name: NumpyBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    KerasBackend.name: KerasBackend,
+}
+
+
+def load_tflite_interpreter():
+    # Prefer the standalone runtime, it avoids importing all of TensorFlow
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter  # Lazy import
+    return Interpreter
+
+
+def get_model_digest(model_path: str) -> str:
+    with open(model_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def get_tflite_path(model_path: str) -> str:
+    # Exported models are keyed by the .h5 content, so a new model never reuses a stale export
+    base_path = os.path.splitext(model_path)[0]
+    return f"{base_path}.{get_model_digest(model_path)}.tflite"
+
+
+def get_int8_path(model_path: str) -> str:
+    # The int8 model can't be derived at runtime, Quantization.py writes it into the cache dir. Keyed by the .h5
+    # content only, so the copy the app extracts from the Qt resources finds what the tool made from the source .h5.
+    return os.path.join(utils.get_temp_dir(), f"Rookception.{get_model_digest(model_path)}.int8.tflite")
+
+
+def get_weights_path(model_path: str) -> str:
+    # NumPy weights sit next to the .h5 (see utils.get_model_path), staleness is checked by digest on load
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+def export_tflite(model_path: str, tflite_path: str):
+    # One-time conversion of the Keras .h5 model to a TFLite flatbuffer
+    import tensorflow as tf  # Lazy import
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(tflite_path, "wb") as f:
+        f.write(converter.convert())
+    print(f"Model exported to: {tflite_path}")
+
+
+def create_backend(model_path: str, backend: str = NumpyBackend.name) -> InferenceBackend:
+    # Builds the requested backend and falls back to the next heavier one if it can't be loaded
+    names = list(BACKENDS)
+    for name in names[names.index(backend) :] if backend in BACKENDS else [backend, *names]:
+        try:
+            return BACKENDS[name](model_path)
+        except Exception as e:
+            if name == KerasBackend.name:
+                raise
+            print(f"[WARNING] Failed to load {name} backend, falling back: {type(e).__name__} - {e}")
@@ -0,0 +1,324 @@
+import argparse
+import json
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+NumPy-only forward pass of the Rookception CNN.
+
+export_weights() dumps a Keras model (a plain stack of layers) into an .npz file:
+    __layers__      JSON list of {"type": <Keras class name>, "config": {...}, "weights": <count>}
+    __source__      sha1 of the .h5 file the weights were exported from
+    <i>_<j>         j-th weight array of layer i
+
+NumpyModel replays the same layers with NumPy (im2col + matmul for convolutions), so boards can be classified
+without importing TensorFlow. Every layer writes into buffers it allocated on the first call, so steady-state
+prediction makes no large allocations; the 1/255 input normalization can be folded into the first layer.
+
+Usage:
+    python -m src.CNNlayer.NumpyModel <model.h5> [--out weights.npz] [--verify] [--atol 1e-4]
+"""
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1
+    return np.reciprocal(x, out=x)
+
+
+def _softmax(x):
+    x -= x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+# In-place activations, only ever applied to a layer's own output buffer
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": lambda x: np.tanh(x, out=x),
+    "softmax": _softmax,
+}
+
+# Config keys kept per layer type, everything else in the Keras config is irrelevant for inference
+LAYER_CONFIG_KEYS = {
+    "Conv2D": ("strides", "padding", "dilation_rate", "activation", "use_bias", "data_format"),
+    "Dense": ("activation", "use_bias"),
+    "MaxPooling2D": ("pool_size", "strides", "padding"),
+    "AveragePooling2D": ("pool_size", "strides", "padding"),
+    "BatchNormalization": ("epsilon", "center", "scale"),
+    "Activation": ("activation",),
+    "ReLU": ("max_value", "negative_slope", "threshold"),
+    "Rescaling": ("scale", "offset"),
+    "Flatten": (),
+    "GlobalAveragePooling2D": (),
+    "GlobalMaxPooling2D": (),
+    "Dropout": (),
+    "SpatialDropout2D": (),
+    "InputLayer": (),
+}
+
+
+class Workspace:
+    # Buffers of one layer, allocated once for a full chunk and reused by every call.
+    # get() returns the view for the n samples of the current chunk.
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.n = chunk_size
+        self._buffers = {}
+
+    def get(self, key, shape, dtype=np.float32, fill=0.0) -> np.ndarray:
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.shape[1:] != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.full((self.chunk_size, *shape), fill, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer[: self.n]
+
+
+def _same_padding(size, kernel, stride):
+    # TensorFlow "same" padding: extra pixel goes after
+    total = max((int(np.ceil(size / stride)) - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def _pad(x, kernel_size, strides, padding, ws: Workspace, value=0.0):
+    # Copies x into the middle of a reused buffer whose border keeps the padding value
+    if padding != "same":
+        return x
+    n, h, w, c = x.shape
+    pad_h = _same_padding(h, kernel_size[0], strides[0])
+    pad_w = _same_padding(w, kernel_size[1], strides[1])
+    padded = ws.get("pad", (h + sum(pad_h), w + sum(pad_w), c), np.float32, value)
+    padded[:, pad_h[0] : pad_h[0] + h, pad_w[0] : pad_w[0] + w] = x
+    return padded
+
+
+def _windows(x, window, strides):
+    # Strided view of all pooling/convolution windows: (n, out_h, out_w, c, kh, kw)
+    return sliding_window_view(x, window, axis=(1, 2))[:, :: strides[0], :: strides[1]]
+
+
+def conv2d(x, kernel, bias, strides, padding, ws: Workspace, dilation_rate=(1, 1)):
+    # im2col convolution: gather every receptive field into a row, then one matmul against the kernel
+    kh, kw, c_in, c_out = kernel.shape
+    dh, dw = dilation_rate
+    eff_h, eff_w = (kh - 1) * dh + 1, (kw - 1) * dw + 1
+    x = _pad(x, (eff_h, eff_w), strides, padding, ws)
+
+    windows = _windows(x, (eff_h, eff_w), strides)[..., ::dh, ::dw]  # (n, oh, ow, c, kh, kw)
+    n, out_h, out_w = windows.shape[:3]
+    cols = ws.get("cols", (out_h * out_w, kh * kw * c_in))
+    np.copyto(cols.reshape(n, out_h, out_w, kh, kw, c_in), windows.transpose(0, 1, 2, 4, 5, 3))
+
+    out = ws.get("out", (out_h * out_w, c_out))
+    np.matmul(cols.reshape(-1, kh * kw * c_in), kernel.reshape(kh * kw * c_in, c_out), out=out.reshape(-1, c_out))
+    if bias is not None:
+        out += bias
+    return out.reshape(n, out_h, out_w, c_out)
+
+
+def pool2d(x, pool_size, strides, padding, reduce, ws: Workspace):
+    x = _pad(x, pool_size, strides, padding, ws, value=-np.inf if reduce is np.max else 0.0)
+    windows = _windows(x, pool_size, strides)
+    return reduce(windows, axis=(4, 5), out=ws.get("out", windows.shape[1:4]))
+
+
+class NumpyModel:
+    def __init__(self, npz_path: str, input_scale: float = 1.0, chunk_size: int = 8):
+        # input_scale is folded into the first layer, e.g. 1 / 255 lets the model take raw uint8 tiles.
+        # Batches run in chunks of chunk_size tiles, which bounds the size of the reused layer buffers.
+        with np.load(npz_path) as data:
+            self.source_digest = str(data["__source__"])
+            specs = json.loads(str(data["__layers__"]))
+            weights = [[data[f"{i}_{j}"] for j in range(spec["weights"])] for i, spec in enumerate(specs)]
+
+        specs, weights = self._fold_input_scale(specs, weights, input_scale)
+        self.layers = [self._build_layer(spec["type"], spec["config"], w) for spec, w in zip(specs, weights)]
+        self.layers = [layer for layer in self.layers if layer is not None]
+
+        self.chunk_size = chunk_size
+        self._workspaces = [Workspace(chunk_size) for _ in self.layers]
+        self._output = None
+
+    @staticmethod
+    def _fold_input_scale(specs, weights, input_scale):
+        if input_scale == 1.0:
+            return specs, weights
+
+        skip = ("InputLayer", "Dropout", "SpatialDropout2D")
+        first = next(i for i, spec in enumerate(specs) if spec["type"] not in skip)
+        if specs[first]["type"] in ("Conv2D", "Dense"):
+            # Linear in its input (zero padding included): scaling the kernel is exact
+            weights = list(weights)
+            weights[first] = [weights[first][0] * np.float32(input_scale), *weights[first][1:]]
+            return specs, weights
+
+        rescaling = {"type": "Rescaling", "config": {"scale": input_scale, "offset": 0.0}, "weights": 0}
+        return [rescaling, *specs], [[], *weights]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Returns (n, classes) probabilities in a buffer that the next call reuses
+        n = len(batch)
+        for start in range(0, n, self.chunk_size):
+            x = batch[start : start + self.chunk_size]
+            for layer, ws in zip(self.layers, self._workspaces):
+                ws.n = len(x)
+                x = layer(x, ws)
+
+            if self._output is None or len(self._output) < n or self._output.shape[1:] != x.shape[1:]:
+                self._output = np.empty((max(n, self.chunk_size), *x.shape[1:]), dtype=np.float32)
+            self._output[start : start + len(x)] = x
+
+        return self._output[:n]
+
+    @staticmethod
+    def _build_layer(layer_type, config, weights):
+        # Returns a callable(x, workspace) for a single layer, None for layers that are a no-op at inference time.
+        # Layers never modify their input, they write into their own workspace.
+        activation = ACTIVATIONS.get(config.get("activation", "linear"))
+        if activation is None:
+            raise ValueError(f"Unsupported activation: {config['activation']}")
+
+        match layer_type:
+            case "InputLayer" | "Dropout" | "SpatialDropout2D":
+                return None
+            case "Conv2D":
+                kernel = weights[0].astype(np.float32)
+                bias = weights[1] if config["use_bias"] else None
+                strides, padding = tuple(config["strides"]), config["padding"]
+                dilation_rate = tuple(config["dilation_rate"])
+                return lambda x, ws: activation(conv2d(x, kernel, bias, strides, padding, ws, dilation_rate))
+            case "Dense":
+                kernel = weights[0].astype(np.float32)
+                bias = weights[1] if config["use_bias"] else None
+
+                def dense(x, ws):
+                    out = np.matmul(x, kernel, out=ws.get("out", (*x.shape[1:-1], kernel.shape[1])))
+                    if bias is not None:
+                        out += bias
+                    return activation(out)
+
+                return dense
+            case "MaxPooling2D" | "AveragePooling2D":
+                pool_size = tuple(config["pool_size"])
+                strides = tuple(config["strides"] or pool_size)
+                reduce = np.max if layer_type == "MaxPooling2D" else np.mean
+                return lambda x, ws: pool2d(x, pool_size, strides, config["padding"], reduce, ws)
+            case "BatchNormalization" | "Rescaling":
+                if layer_type == "BatchNormalization":
+                    weights = list(weights)
+                    gamma = weights.pop(0) if config["scale"] else 1.0
+                    beta = weights.pop(0) if config["center"] else 0.0
+                    mean, variance = weights
+                    # Fold into a single multiply-add
+                    scale = (gamma / np.sqrt(variance + config["epsilon"])).astype(np.float32)
+                    shift = (beta - mean * scale).astype(np.float32)
+                else:
+                    scale, shift = np.float32(config["scale"]), np.float32(config["offset"])
+
+                def multiply_add(x, ws):
+                    out = np.multiply(x, scale, out=ws.get("out", x.shape[1:]))
+                    out += shift
+                    return out
+
+                return multiply_add
+            case "Activation":
+
+                def apply_activation(x, ws):
+                    out = ws.get("out", x.shape[1:])
+                    np.copyto(out, x)
+                    return activation(out)
+
+                return apply_activation
+            case "ReLU":
+                max_value = config.get("max_value")
+                negative_slope = config.get("negative_slope") or 0.0
+                threshold = config.get("threshold") or 0.0
+
+                def relu(x, ws):
+                    out = ws.get("out", x.shape[1:])
+                    if negative_slope or threshold:
+                        np.copyto(out, np.where(x >= threshold, x, negative_slope * (x - threshold)))
+                    else:
+                        np.maximum(x, 0, out=out)
+                    return out if max_value is None else np.minimum(out, max_value, out=out)
+
+                return relu
+            case "Flatten":
+                return lambda x, ws: x.reshape(x.shape[0], -1)
+            case "GlobalAveragePooling2D":
+                return lambda x, ws: np.mean(x, axis=(1, 2), out=ws.get("out", x.shape[3:]))
+            case "GlobalMaxPooling2D":
+                return lambda x, ws: np.max(x, axis=(1, 2), out=ws.get("out", x.shape[3:]))
+        raise ValueError(f"Unsupported layer type: {layer_type}")
+
+
+def export_weights(model_path: str, npz_path: str, source_digest: str):
+    # Dumps the Keras model layers and weights into an .npz for NumpyModel (needs TensorFlow)
+    from tensorflow.keras.models import load_model  # Lazy import
+
+    model = load_model(model_path)
+    specs, arrays = [], {}
+    for i, layer in enumerate(model.layers):
+        layer_type = type(layer).__name__
+        if layer_type not in LAYER_CONFIG_KEYS:
+            raise ValueError(f"Layer {layer.name} ({layer_type}) is not supported by NumpyModel")
+
+        config = layer.get_config()
+        if config.get("data_format", "channels_last") != "channels_last":
+            raise ValueError(f"Layer {layer.name} must use channels_last")
+
+        weights = layer.get_weights()
+        specs.append(
+            {
+                "type": layer_type,
+                "config": {key: config.get(key) for key in LAYER_CONFIG_KEYS[layer_type]},
+                "weights": len(weights),
+            }
+        )
+        arrays.update({f"{i}_{j}": w.astype(np.float32) for j, w in enumerate(weights)})
+
+    np.savez(npz_path, __layers__=json.dumps(specs), __source__=source_digest, **arrays)
+    print(f"Weights exported to: {npz_path}")
+
+
+def verify_against_keras(model_path: str, npz_path: str, batch: np.ndarray | None = None, atol: float = 1e-4):
+    # Checks the NumPy forward pass against Keras on the same tiles, returns the max absolute difference
+    from tensorflow.keras.models import load_model  # Lazy import
+
+    if batch is None:
+        batch = np.random.default_rng(0).random((64, 64, 64, 3), dtype=np.float32)
+
+    expected = load_model(model_path).predict(batch, verbose=0)
+    actual = NumpyModel(npz_path).predict(batch)
+
+    max_diff = float(np.abs(expected - actual).max())
+    same_class = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()) * 100
+    print(f"max abs diff: {max_diff:.2e} (tolerance {atol:.0e}), same class: {same_class:.1f}%")
+    if max_diff > atol:
+        raise ValueError(f"NumPy forward pass differs from Keras by {max_diff:.2e} (tolerance {atol:.0e})")
+    return max_diff
+
+
+if __name__ == "__main__":
+    from src.CNNlayer.InferenceBackends import get_model_digest, get_weights_path
+
+    parser = argparse.ArgumentParser(description="Export Rookception weights for the NumPy backend")
+    parser.add_argument("model", help="Path to the Rookception .h5 model")
+    parser.add_argument("--out", help="Output .npz path, defaults to the path the NumPy backend looks for")
+    parser.add_argument("--verify", action="store_true", help="Compare the NumPy forward pass against Keras")
+    parser.add_argument("--atol", type=float, default=1e-4, help="Max absolute difference allowed by --verify")
+    args = parser.parse_args()
+
+    out_path = args.out or get_weights_path(args.model)
+    export_weights(args.model, out_path, get_model_digest(args.model))
+    if args.verify:
+        verify_against_keras(args.model, out_path, atol=args.atol)
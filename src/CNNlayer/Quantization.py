@@ -0,0 +1,136 @@
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from src.CNNlayer.InferenceBackends import BACKENDS, NumpyBackend, TFLiteBackend, TFLiteInt8Backend, get_int8_path
+from src.CNNlayer.Rookception import Rookception, tile_board
+from src.core.dataclasses.BoardState import CLASS_LABELS
+
+"""
+Int8 post-training quantization of the Rookception CNN.
+
+quantize_model() calibrates the TFLite converter on tiles cut from full board screenshots and writes the int8 model
+into the DeepRook cache dir, named by the .h5 digest, where the "tflite-int8" backend picks it up.
+
+evaluate_quantized() compares the float and int8 models on tiles. Ground truth comes from a labeled tile directory
+(<dir>/<class label>/*.png, the training layout), or from the float model when only board images are given.
+
+Usage:
+    python -m src.CNNlayer.Quantization <model.h5> <calibration boards dir> [--eval <labeled tiles dir>]
+"""
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def _list_images(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def load_board_tiles(board_dir, img_size=(64, 64)) -> np.ndarray:
+    # All 64 tiles of every board image in board_dir, normalized: (n * 64, 64, 64, 3)
+    boards = [
+        tile_board(Rookception.load_image(path), img_size).reshape(-1, *img_size, 3) for path in _list_images(board_dir)
+    ]
+    if not boards:
+        raise FileNotFoundError(f"No board images found in {board_dir}")
+    return Rookception.normalize(np.concatenate(boards))
+
+
+def load_labeled_tiles(tiles_dir, class_labels, img_size=(64, 64)):
+    # Tiles and class indices from <tiles_dir>/<class label>/*.png
+    tiles, labels = [], []
+    for class_index, label in enumerate(class_labels):
+        class_dir = os.path.join(tiles_dir, label)
+        if not os.path.isdir(class_dir):
+            continue
+        for path in _list_images(class_dir):
+            tiles.append(cv2.resize(Rookception.load_image(path), img_size, interpolation=cv2.INTER_LINEAR))
+            labels.append(class_index)
+    return Rookception.normalize(np.stack(tiles)), np.array(labels)
+
+
+def quantize_model(model_path, calibration_tiles: np.ndarray, out_path=None, max_samples=500):
+    # Full-integer quantization of weights and activations, calibrated on real tiles
+    import tensorflow as tf  # Lazy import
+
+    out_path = out_path or get_int8_path(model_path)
+    rng = np.random.default_rng(0)
+    samples = calibration_tiles[rng.permutation(len(calibration_tiles))[:max_samples]]
+
+    def representative_dataset():
+        for tile in samples:
+            yield [tile[None]]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(tf.keras.models.load_model(model_path))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+    print(f"Int8 model written to: {out_path} ({os.path.getsize(out_path) / 1024:.0f} KB)")
+    return out_path
+
+
+def _per_board_latency(backend, tiles, repeats=20):
+    batch = tiles[:64]
+    backend.predict(batch)  # Warm up
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        backend.predict(batch)
+    return (time.perf_counter() - start_time) * 1000 / repeats
+
+
+def evaluate_quantized(model_path, tiles, labels=None, class_labels=None, reference=NumpyBackend.name):
+    # Prints per-class accuracy of the float and int8 models plus per-board latency, returns the accuracy deltas
+    float_backend = BACKENDS[reference](model_path)
+    int8_backend = TFLiteInt8Backend(model_path)
+    float_classes = float_backend.predict(tiles).argmax(axis=1)
+    int8_classes = int8_backend.predict(tiles).argmax(axis=1)
+    if labels is None:
+        print(f"No labeled tiles, using the {reference} model as ground truth")
+        labels = float_classes
+
+    class_labels = class_labels or [str(i) for i in range(int(labels.max()) + 1)]
+    deltas = {}
+    print(f"{'class':<8}{'tiles':>7}{'float':>9}{'int8':>9}{'delta':>9}")
+    for class_index, label in enumerate(class_labels):
+        mask = labels == class_index
+        if not mask.any():
+            continue
+        float_acc = (float_classes[mask] == class_index).mean() * 100
+        int8_acc = (int8_classes[mask] == class_index).mean() * 100
+        deltas[label] = int8_acc - float_acc
+        print(f"{label:<8}{mask.sum():>7}{float_acc:>8.2f}%{int8_acc:>8.2f}%{deltas[label]:>+8.2f}%")
+
+    float_ms = _per_board_latency(float_backend, tiles)
+    int8_ms = _per_board_latency(int8_backend, tiles)
+    print(f"per board: {reference} {float_ms:.2f} ms, int8 {int8_ms:.2f} ms ({float_ms / int8_ms:.1f}x)")
+
+    float_size = os.path.getsize(model_path)
+    int8_size = os.path.getsize(get_int8_path(model_path))
+    print(f"model size: float32 .h5 {float_size / 1024:.0f} KB, int8 {int8_size / 1024:.0f} KB")
+    return deltas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Int8 post-training quantization of Rookception")
+    parser.add_argument("model", help="Path to the Rookception .h5 model")
+    parser.add_argument("boards", help="Directory of board screenshots used for calibration")
+    parser.add_argument("--eval", dest="eval_dir", help="Labeled tiles directory (<class label>/*.png) to evaluate on")
+    parser.add_argument("--reference", default=NumpyBackend.name, choices=[NumpyBackend.name, TFLiteBackend.name])
+    args = parser.parse_args()
+
+    board_tiles = load_board_tiles(args.boards)
+    quantize_model(args.model, board_tiles)
+
+    if args.eval_dir:
+        eval_tiles, eval_labels = load_labeled_tiles(args.eval_dir, CLASS_LABELS)
+        evaluate_quantized(args.model, eval_tiles, eval_labels, CLASS_LABELS, args.reference)
+    else:
+        evaluate_quantized(args.model, board_tiles, class_labels=CLASS_LABELS, reference=args.reference)
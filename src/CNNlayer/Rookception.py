@@ -1,64 +1,215 @@
+import cv2
 import numpy as np
 from PIL import Image
 import time
 
+from src.CNNlayer.InferenceBackends import InferenceBackend, NumpyBackend, create_backend
+from src.core.dataclasses.BoardGrid import BoardGrid
+from src.core.dataclasses.BoardState import CLASS_LABELS, EMPTY_CLASS, BoardState
 from src.utils import utils
 
 
-class Rookception:
-    def __init__(self, model_path: str):
-        from tensorflow.keras.models import load_model  # Lazy import
-
-        self.model = load_model(model_path)
-        self.class_labels = ["bB", "bK", "bN", "bP", "bQ", "bR", "empty", "wB", "wK", "wN", "wP", "wQ", "wR"]
-        self.img_size = (64, 64)
-
-    def extract_squares(self, image_path):
-        # Extracts 64 squares from a chessboard image
-        image = Image.open(image_path).convert("RGB")
-        width, height = image.size
-
-        square_width = width // 8
-        square_height = height // 8
-
-        # Preallocate NumPy array
-        squares = np.zeros((8, 8, self.img_size[0], self.img_size[1], 3), dtype=np.float32)
-
-        for row in range(8):
-            for col in range(8):
-                left, top = col * square_width, row * square_height
-                right, bottom = (col + 1) * square_width, (row + 1) * square_height
-
-                # Extract, resize, normalize
-                squares[row, col] = (
-                    np.array(image.crop((left, top, right, bottom)).resize(self.img_size), dtype=np.float32) / 255.0
-                )
-
-        return squares  # Shape: (8, 8, img_size[0], img_size[1], 3)
-
-    def predict_board(self, image_path):
-        # Recognizes all pieces on the chessboard using batch prediction
-        squares = self.extract_squares(image_path)  # (8, 8, 64, 64, 3)
-        print("\nRecognizing Pieces...")
-        # **Flatten the board for batch prediction**
-        all_squares = squares.reshape(-1, 64, 64, 3)  # Shape: (64, 64, 64, 3)
+def tile_board(
+    board: np.ndarray, tile_size=(64, 64), out: np.ndarray | None = None, grid: BoardGrid | None = None
+) -> np.ndarray:
+    # Resizes the whole board once and views it as 8x8 tiles: (8, 8, tile_h, tile_w, 3).
+    # out is an optional (8 * tile_h, 8 * tile_w, 3) uint8 buffer the board is resized into.
+    # grid cuts the tiles on refined square boundaries (see BoardLocator.refine_grid) instead of the region // 8.
+    if grid is not None:
+        return _tile_board_on_grid(board, tile_size, out, grid)
+
+    height, width = board.shape[:2]
+    tile_w, tile_h = tile_size
+
+    # Trim the remainder like the integer // 8 square crop does
+    board = board[: (height // 8) * 8, : (width // 8) * 8]
+    # Area averaging only pays off against aliasing on large downscales, bilinear is much faster otherwise
+    interpolation = cv2.INTER_AREA if width > 16 * tile_w else cv2.INTER_LINEAR
+    board = cv2.resize(board, (8 * tile_w, 8 * tile_h), dst=out, interpolation=interpolation)
+
+    # (8 * h, 8 * w, 3) -> (8, h, 8, w, 3) -> (8, 8, h, w, 3)
+    return board.reshape(8, tile_h, 8, tile_w, 3).swapaxes(1, 2)
+
+
+def _tile_board_on_grid(board, tile_size, out, grid: BoardGrid) -> np.ndarray:
+    # One affine warp (scale + sub-pixel shift) maps the grid onto the tile layout. Squares that reach past the
+    # region (a region cut into the board) repeat its edge pixels.
+    tile_w, tile_h = tile_size
+    scale_x, scale_y = grid.square_width / tile_w, grid.square_height / tile_h  # Board pixels per tile pixel
+    left, top = grid.left, grid.top
+    shrink = int(min(scale_x, scale_y) // 2)
+    if shrink > 1:
+        # Same anti-aliasing as tile_board: area average large boards first, the warp then samples at most 2:1
+        board = cv2.resize(board, None, fx=1 / shrink, fy=1 / shrink, interpolation=cv2.INTER_AREA)
+        scale_x, scale_y, left, top = scale_x / shrink, scale_y / shrink, left / shrink, top / shrink
+
+    # Tile pixel j covers board edge coordinates [left + j * scale, left + (j + 1) * scale), pixel centers are at
+    # +0.5 on both sides
+    matrix = np.array(
+        [[scale_x, 0.0, left + 0.5 * scale_x - 0.5], [0.0, scale_y, top + 0.5 * scale_y - 0.5]], dtype=np.float64
+    )
+    board = cv2.warpAffine(
+        board,
+        matrix,
+        (8 * tile_w, 8 * tile_h),
+        dst=out,
+        flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+    return board.reshape(8, tile_h, 8, tile_w, 3).swapaxes(1, 2)
 
-        # **Perform batch prediction**
-        predictions = self.model.predict(all_squares)  # Predict all 64 squares at once
 
-        # **Process results**
-        predicted_classes = np.argmax(predictions, axis=1).reshape(8, 8)
-        confidences = np.max(predictions, axis=1).reshape(8, 8) * 100  # Get confidence %
-        board_state = np.vectorize(lambda x: self.class_labels[x])(predicted_classes)
-        board_with_accuracy = np.vectorize(lambda x, y: f"{self.class_labels[x]} ({y:.2f}%)")(
-            predicted_classes, confidences
-        )
+class Rookception:
+    def __init__(self, model_path: str, change_threshold: int = 12, backend: str = NumpyBackend.name):
+        self.backend: InferenceBackend = create_backend(model_path, backend)
+        self.class_labels = CLASS_LABELS
+        self.img_size = (64, 64)
 
-        # utils.print_board(board=board_with_accuracy, title="Predicted board with accuracy")
+        # Reused input buffers, steady-state prediction makes no large allocations
+        self._board_buffer = np.empty((8 * self.img_size[1], 8 * self.img_size[0], 3), dtype=np.uint8)
+        self._tile_buffer = np.empty((64, *self.img_size, 3), dtype=np.uint8)  # Contiguous tiles, row-major
+        self._batch_buffer = np.empty_like(self._tile_buffer)  # Tiles sent to the CNN
+
+        # Per-square change cache: a square is re-classified only if its thumbnail moved past the threshold
+        self.change_threshold = change_threshold
+        self.stats = {"tiles_classified": 0, "tiles_cached": 0, "tiles_prefiltered": 0}
+        self.invalidate_cache()
+
+        # Empty-square prefilter: tiles with a flat interior are labeled empty without the CNN.
+        # The threshold stays None (prefilter off) until calibrated on a starting position.
+        self.empty_threshold = None
+
+    def invalidate_cache(self):
+        # Forget all cached square results, call this when the board region or theme changes
+        self._tile_fingerprints = None
+        self._cached_classes = np.zeros((8, 8), dtype=np.uint8)
+        self._cached_confidences = np.zeros((8, 8), dtype=np.float16)
+
+    def reset_empty_prefilter(self):
+        # Call when the board theme changes, the next starting position recalibrates the threshold
+        self.empty_threshold = None
+
+    @staticmethod
+    def load_image(image) -> np.ndarray:
+        # Accepts a file path or an RGB NumPy array (e.g. an mss grab) and returns an RGB array
+        if isinstance(image, np.ndarray):
+            return image
+        return np.asarray(Image.open(image).convert("RGB"))
+
+    @staticmethod
+    def normalize(squares: np.ndarray) -> np.ndarray:
+        return np.multiply(squares, np.float32(1 / 255.0), dtype=np.float32)
+
+    @staticmethod
+    def fingerprint_squares(board: np.ndarray) -> np.ndarray:
+        # Small perceptual hash per square of a resized board (see tile_board): an 8x8 grayscale thumbnail of
+        # every tile, shape (8, 8, 8, 8)
+        thumbnail = cv2.cvtColor(cv2.resize(board, (64, 64), interpolation=cv2.INTER_AREA), cv2.COLOR_RGB2GRAY)
+        return thumbnail.reshape(8, 8, 8, 8).swapaxes(1, 2).astype(np.int16)
+
+    @staticmethod
+    def empty_scores(board: np.ndarray) -> np.ndarray:
+        # Grayscale std of every tile interior of a resized board, shape (8, 8). The border is skipped so
+        # coordinate labels and last-move highlights don't count as content.
+        thumbnail = cv2.cvtColor(cv2.resize(board, (128, 128), interpolation=cv2.INTER_AREA), cv2.COLOR_RGB2GRAY)
+        interiors = thumbnail.reshape(8, 16, 8, 16).swapaxes(1, 2)[:, :, 2:14, 2:14]
+        return interiors.std(axis=(2, 3), dtype=np.float32)
+
+    def calibrate_empty_prefilter(self, scores: np.ndarray, empty: np.ndarray, min_ratio: float = 2.0):
+        # Puts the threshold between the busiest empty tile and the flattest occupied one.
+        # Leaves the prefilter off if the two groups don't separate by at least min_ratio.
+        max_empty = scores[empty].max()
+        min_occupied = scores[~empty].min()
+        if min_occupied < max(max_empty, 1.0) * min_ratio:
+            print(f"[WARNING] Empty prefilter not calibrated: empty <= {max_empty:.1f}, occupied >= {min_occupied:.1f}")
+            return
+
+        self.empty_threshold = float(np.sqrt(max(max_empty, 1.0) * min_occupied))  # Geometric midpoint
+        print(f"Empty prefilter calibrated: threshold {self.empty_threshold:.1f}")
+
+    @staticmethod
+    def is_starting_position(classes: np.ndarray) -> bool:
+        # Ranks 3-6 empty and ranks 1, 2, 7, 8 fully occupied, in either orientation
+        empty = classes == EMPTY_CLASS
+        return bool(empty[2:6].all() and not empty[:2].any() and not empty[6:].any())
+
+    def _changed_squares(self, fingerprints: np.ndarray) -> np.ndarray:
+        # (8, 8) mask of squares whose fingerprint differs from the cached one
+        if self._tile_fingerprints is None:
+            self._tile_fingerprints = fingerprints
+            return np.ones((8, 8), dtype=bool)
+
+        diff = np.abs(fingerprints - self._tile_fingerprints).max(axis=(2, 3))
+        changed = diff > self.change_threshold
+        # Only refresh changed fingerprints so slow drift still adds up to a change
+        self._tile_fingerprints[changed] = fingerprints[changed]
+        return changed
+
+    def predict_board(self, image, grid: BoardGrid | None = None):
+        # Recognizes all pieces on the chessboard, only changed squares that aren't obviously empty go to the CNN.
+        # grid holds the refined square boundaries of the region, the image is split with // 8 without it.
+        squares = tile_board(self.load_image(image), self.img_size, out=self._board_buffer, grid=grid)
+        changed = self._changed_squares(self.fingerprint_squares(self._board_buffer))
+        scores = self.empty_scores(self._board_buffer)
+
+        prefiltered = np.zeros((8, 8), dtype=bool)
+        if self.empty_threshold is not None:
+            prefiltered = changed & (scores < self.empty_threshold)
+            self._cached_classes[prefiltered] = EMPTY_CLASS
+            self._cached_confidences[prefiltered] = 100.0
+
+        to_classify = changed & ~prefiltered
+        num_changed = int(changed.sum())
+        num_classified = int(to_classify.sum())
+        print(f"\nRecognizing Pieces... ({num_changed}/64 squares changed, {num_classified} sent to the CNN)")
+
+        if num_classified:
+            # **Perform batch prediction on the ambiguous changed squares only**
+            # Raw uint8 tiles, the backend folds the 1/255 normalization into the model or its own buffer
+            np.copyto(self._tile_buffer.reshape(squares.shape), squares)
+            # mode="clip" lets take() write straight into out, "raise" would go through a temporary copy
+            indices = np.flatnonzero(to_classify)
+            batch = np.take(self._tile_buffer, indices, axis=0, out=self._batch_buffer[:num_classified], mode="clip")
+            predictions = self.backend.predict(batch)  # Shape: (n, 13)
+
+            # **Process results**
+            self._cached_classes[to_classify] = np.argmax(predictions, axis=1)
+            self._cached_confidences[to_classify] = np.max(predictions, axis=1) * 100  # Get confidence %
+
+        if self.empty_threshold is None and self.is_starting_position(self._cached_classes):
+            self.calibrate_empty_prefilter(scores, self._cached_classes == EMPTY_CLASS)
+
+        self.stats["tiles_prefiltered"] += num_changed - num_classified
+        self.stats["tiles_classified"] += num_classified
+        self.stats["tiles_cached"] += 64 - num_changed
+
+        board_state = BoardState(self._cached_classes.copy(), self._cached_confidences.copy())
+
+        # utils.print_board(board=board_state.labels_with_confidence(), title="Predicted board with accuracy")
         utils.print_board(board=board_state, title="Predicted board")
 
         return board_state
 
+    def predict_boards(self, images, batch_size=16):
+        # Offline recognition of many boards (recorded sessions, datasets): stacks batch_size boards into one
+        # (batch_size * 64)-tile batch and yields one board_state per image, in order. Skips the change cache.
+        boards = []
+        for image in images:
+            boards.append(tile_board(self.load_image(image), self.img_size).reshape(-1, *self.img_size, 3))
+            if len(boards) == batch_size:
+                yield from self._predict_batch(boards)
+                boards = []
+
+        if boards:
+            yield from self._predict_batch(boards)
+
+    def _predict_batch(self, boards):
+        predictions = self.backend.predict(np.concatenate(boards))
+        predicted_classes = np.argmax(predictions, axis=1).astype(np.uint8).reshape(-1, 8, 8)
+        confidences = (np.max(predictions, axis=1) * 100).astype(np.float16).reshape(-1, 8, 8)
+        for board_classes, board_confidences in zip(predicted_classes, confidences):
+            yield BoardState(board_classes, board_confidences)
+
 
 if __name__ == "__main__":
     model_path = r"C:\Users\christian\Desktop\Thefolder\Projects\DeepRook\resources\models\CNN\RookceptionCNN_V1.h5"
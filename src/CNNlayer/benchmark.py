@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.CNNlayer.InferenceBackends import BACKENDS, create_backend
+from src.CNNlayer.Rookception import Rookception, tile_board
+
+
+def _extract_squares_loop(image: np.ndarray, img_size=(64, 64)) -> np.ndarray:
+    # Reference: the per-square PIL crop + resize loop Rookception used before tile_board
+    image = Image.fromarray(image)
+    width, height = image.size
+    square_width = width // 8
+    square_height = height // 8
+
+    squares = np.zeros((8, 8, img_size[0], img_size[1], 3), dtype=np.float32)
+    for row in range(8):
+        for col in range(8):
+            left, top = col * square_width, row * square_height
+            right, bottom = (col + 1) * square_width, (row + 1) * square_height
+            squares[row, col] = (
+                np.array(image.crop((left, top, right, bottom)).resize(img_size), dtype=np.float32) / 255.0
+            )
+    return squares
+
+
+def _extract_squares_vectorized(image: np.ndarray, img_size=(64, 64)) -> np.ndarray:
+    return np.multiply(tile_board(image, img_size), np.float32(1 / 255.0), dtype=np.float32)
+
+
+def _time_call(func, *args, repeats=50):
+    func(*args)  # Warm up
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        func(*args)
+    return (time.perf_counter() - start_time) * 1000 / repeats  # ms per call
+
+
+def benchmark_extract_squares(board_size=800, repeats=50):
+    # Compares square extraction of the old Python loop against the whole-board tiling
+    board = _synthetic_board(board_size)
+
+    loop_ms = _time_call(_extract_squares_loop, board, repeats=repeats)
+    vectorized_ms = _time_call(_extract_squares_vectorized, board, repeats=repeats)
+    max_diff = np.abs(_extract_squares_loop(board) - _extract_squares_vectorized(board)).max()
+
+    print(f"extract_squares ({board_size}x{board_size}):")
+    print(f"  loop:       {loop_ms:.2f} ms")
+    print(f"  vectorized: {vectorized_ms:.2f} ms ({loop_ms / vectorized_ms:.1f}x faster)")
+    print(f"  max abs diff: {max_diff:.4f}")
+    return loop_ms, vectorized_ms
+
+
+def _peak_rss_mb():
+    # Peak resident set size of the current process, None if the platform offers no way to read it
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024**2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / 1024**2  # Windows only
+    except (ImportError, AttributeError):
+        return None
+
+
+def _run_backend(model_path, backend_name, boards, results):
+    # Runs in a fresh process so load time and peak RSS aren't shared between backends
+    start_time = time.perf_counter()
+    backend = create_backend(model_path, backend_name)
+    load_ms = (time.perf_counter() - start_time) * 1000
+
+    batch = np.random.default_rng(0).integers(0, 256, (64, 64, 64, 3), dtype=np.uint8)
+    latency_ms = _time_call(backend.predict, batch, repeats=boards)
+    results.put((backend.name, load_ms, latency_ms, _peak_rss_mb()))
+
+
+def benchmark_backends(model_path, backends=tuple(BACKENDS), boards=50):
+    # Compares load time, per-board (64 tile) latency and peak RSS of the inference backends
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+
+    print(f"{'backend':<10}{'loaded as':<12}{'load':>10}{'per board':>12}{'peak RSS':>12}")
+    for backend_name in backends:
+        process = context.Process(target=_run_backend, args=(model_path, backend_name, boards, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{backend_name:<10}failed (exit code {process.exitcode})")
+            continue
+        name, load_ms, latency_ms, peak_rss = results.get()
+        rss = f"{peak_rss:.0f} MB" if peak_rss is not None else "n/a"
+        print(f"{backend_name:<10}{name:<12}{load_ms:>7.0f} ms{latency_ms:>9.2f} ms{rss:>12}")
+
+
+def benchmark_predict_boards(model_path, backend_name=None, batch_sizes=(1, 4, 16, 64), boards=128, board_size=800):
+    # Throughput of Rookception.predict_boards in boards per second for growing batch sizes
+    recognizer = Rookception(model_path, **({"backend": backend_name} if backend_name else {}))
+    frames = np.random.default_rng(0).integers(0, 256, (8, board_size, board_size, 3), dtype=np.uint8)
+    images = [frames[i % len(frames)] for i in range(boards)]
+
+    print(f"predict_boards ({recognizer.backend.name} backend, {boards} boards):")
+    for batch_size in batch_sizes:
+        start_time = time.perf_counter()
+        for _ in recognizer.predict_boards(images, batch_size=batch_size):
+            pass
+        elapsed = time.perf_counter() - start_time
+        print(f"  batch {batch_size:>3}: {boards / elapsed:8.1f} boards/s")
+
+
+def _synthetic_board(board_size=800, seed=0):
+    # Smooth synthetic board: 8x8 checker pattern with a gradient, closer to real captures than noise
+    rng = np.random.default_rng(seed)
+    coords = np.arange(board_size) * 8 // board_size
+    checker = ((coords[:, None] + coords[None, :]) % 2 * 100 + 80).astype(np.float32)
+    gradient = np.linspace(0, 60, board_size, dtype=np.float32)
+    board = checker[..., None] + gradient[None, :, None] + rng.normal(0, 4, (board_size, board_size, 3))
+    return np.clip(board, 0, 255).astype(np.uint8)
+
+
+def check_steady_state_allocations(model_path, backend_name=None, frames=10, limit_kb=256):
+    # Traces predict_board on alternating frames (every square changes, so all 64 tiles go to the CNN) and fails if
+    # the peak of new allocations exceeds limit_kb. A single float32 copy of the tiles alone would be ~3 MB.
+    recognizer = Rookception(model_path, **({"backend": backend_name} if backend_name else {}))
+    boards = [_synthetic_board(seed=0), 255 - _synthetic_board(seed=1)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for board in boards:  # Warm up: the first calls allocate the reused buffers
+            recognizer.predict_board(board)
+
+        tracemalloc.start()
+        for i in range(frames):
+            recognizer.predict_board(boards[i % 2])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    peak_kb = peak / 1024
+    print(
+        f"predict_board steady state ({recognizer.backend.name} backend): peak {peak_kb:.0f} KB (limit {limit_kb} KB)"
+    )
+    if peak_kb > limit_kb:
+        raise AssertionError(f"predict_board allocated {peak_kb:.0f} KB per frame, expected at most {limit_kb} KB")
+    return peak_kb
+
+
+def benchmark_replay(model_path, replay_path, max_frames=None, engine=False, speed=0.0):
+    # Headless run of the live pipeline on a recording: capture -> change detection -> recognition (-> engine).
+    # speed 0 replays as fast as the pipeline goes, 1 in real time. The whole replay frame is the board region.
+    from src.bot.BoardLocator import refine_grid
+    from src.core.BoardChangeDetector import BoardChangeDetector
+    from src.core.dataclasses.BoardGrid import BoardGrid
+    from src.gui.userscreenview.CaptureSources import ReplayCaptureSource
+
+    recognizer = Rookception(model_path)
+    detector = BoardChangeDetector()
+    stockfish = None
+    if engine:
+        from src.ChessEngine.stockfish.StockfishLayer import StockfishLayer
+
+        stockfish = StockfishLayer()
+
+    timings = {"recognition": [], "engine": []}
+    frames = 0
+    grid = None  # Refined once on the first frame, like the live view does per region
+    start_time = time.perf_counter()
+    with ReplayCaptureSource(replay_path, speed=speed, loop=False) as source, contextlib.redirect_stdout(io.StringIO()):
+        monitor = source.monitors()[1]
+        while not source.finished and (max_frames is None or frames < max_frames):
+            frame = source.grab(monitor)
+            frames += 1
+            if not detector.process(frame):
+                continue
+
+            if grid is None:
+                grid = refine_grid(frame) or BoardGrid.uniform(frame.shape[1], frame.shape[0])
+            step_time = time.perf_counter()
+            board_state = recognizer.predict_board(cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB), grid)
+            timings["recognition"].append(time.perf_counter() - step_time)
+            if stockfish is not None:
+                step_time = time.perf_counter()
+                stockfish.get_next_move(board_state, "w")
+                timings["engine"].append(time.perf_counter() - step_time)
+    elapsed = time.perf_counter() - start_time
+
+    stats = detector.stats
+    print(f"replay {replay_path} ({recognizer.backend.name} backend):")
+    print(f"  {frames} frames in {elapsed:.2f} s ({frames / elapsed:.1f} fps)")
+    print(f"  {stats['settled']} settled changes, {stats['frames_filtered']} frames filtered")
+    for stage, samples in timings.items():
+        if samples:
+            print(f"  {stage}: {np.mean(samples) * 1000:.2f} ms mean, {np.max(samples) * 1000:.2f} ms max")
+    if stockfish is not None:
+        print(f"  evaluation cache: {stockfish.evaluation_cache.summary()}")
+    return frames, elapsed, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rookception micro-benchmarks")
+    parser.add_argument("--model", help="Path to the Rookception .h5 model, enables the backend comparison")
+    parser.add_argument("--boards", type=int, default=50, help="Boards per backend")
+    parser.add_argument("--replay", help="Video file or image directory to run the live pipeline on (needs --model)")
+    parser.add_argument("--engine", action="store_true", help="Include Stockfish in the --replay run")
+    args = parser.parse_args()
+
+    benchmark_extract_squares()
+    if args.model:
+        benchmark_backends(args.model, boards=args.boards)
+        check_steady_state_allocations(args.model)
+        benchmark_predict_boards(args.model)
+    if args.model and args.replay:
+        benchmark_replay(args.model, args.replay, engine=args.engine)
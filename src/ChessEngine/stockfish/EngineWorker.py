@@ -0,0 +1,116 @@
+import threading
+
+from PySide6.QtCore import QCoreApplication, QObject, QThread, Qt, Signal, Slot
+
+from src.ChessEngine.stockfish.StockfishLayer import StockfishLayer
+from src.core.dataclasses.BoardState import BoardState
+from src.core.dataclasses.SearchResult import EngineLine
+
+"""
+Runs StockfishLayer on its own QThread so the GUI thread never waits for a search.
+
+request_search only stores the board and returns. The worker thread always takes the newest stored request, boards
+that arrive while it's busy replace each other instead of queuing up. A running search is stopped as soon as a newer
+board arrives, its result is dropped and the new board is searched right away.
+
+Signals are emitted from the worker thread, slots of GUI objects connected to them run on the GUI thread.
+"""
+
+
+class EngineWorker(QObject):
+    engineReady = Signal()  # StockfishLayer started, requests before that wait for it
+    # (request id, multipv index, EngineLine) for every finished line while the search runs, 1 is the best line.
+    # Deeper lines follow shallower ones.
+    infoUpdated = Signal(int, int, object)
+    # (request id, best move or None) once the newest request's search is done
+    moveFound = Signal(int, object)
+    _requested = Signal()  # Wakes the worker thread, queued onto it
+
+    def __init__(self):
+        super().__init__()
+        self.engine: StockfishLayer | None = None  # Created and only used on the worker thread
+        self._lock = threading.Lock()  # Guards the pending request, the searching flag and writes of "stop"
+        self._pending = None  # Newest (request id, board state, turn) not started yet
+        self._searching = False  # A search is running and will read "stop"
+        self._stop_sent = False  # The running request was already stopped
+        self._request_id = 0
+        self.stats = {"requests": 0, "searched": 0, "stopped": 0, "superseded": 0}
+
+        self._thread = QThread()
+        self._thread.setObjectName("EngineWorker")
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self._start_engine)
+        self._requested.connect(self._run_pending)
+        # Direct: the worker lives on its own thread, a queued shutdown would wait for itself
+        QCoreApplication.instance().aboutToQuit.connect(self.shutdown, Qt.ConnectionType.DirectConnection)
+        self._thread.start()
+
+    def is_ready(self) -> bool:
+        return self.engine is not None
+
+    def request_search(self, board_state: BoardState, turn) -> int:
+        # Called from the GUI thread, returns the request's id the signals are tagged with. Replaces a request that
+        # hasn't started yet and stops the search of an older one.
+        with self._lock:
+            self._request_id += 1
+            self.stats["requests"] += 1
+            if self._pending is not None:
+                self.stats["superseded"] += 1
+            self._pending = (self._request_id, board_state, turn)
+            if self._searching:
+                self._stop_search()
+            request_id = self._request_id
+        self._requested.emit()
+        return request_id
+
+    def shutdown(self):
+        # Stops a running search and ends the worker thread, waits for it so the engine process isn't orphaned
+        with self._lock:
+            self._pending = None
+            if self._searching:
+                self._stop_search()
+        self._thread.quit()
+        self._thread.wait()
+
+    def _stop_search(self):
+        # Lock held, the search in progress is stale
+        self._searching = False
+        self._stop_sent = True
+        self.stats["stopped"] += 1
+        self.engine.stop()
+
+    @Slot()
+    def _start_engine(self):
+        self.engine = StockfishLayer()
+        self.engineReady.emit()
+        self._run_pending()  # Boards requested while the engine started
+
+    @Slot()
+    def _run_pending(self):
+        if self.engine is None:
+            return
+        with self._lock:
+            if self._pending is None:
+                return  # Already taken by an earlier wake-up
+            request_id, board_state, turn = self._pending
+            self._pending = None
+            self._stop_sent = False
+
+        def on_info(index: int, line: EngineLine):
+            with self._lock:
+                if self._pending is not None:
+                    # A newer board arrived, maybe before the search started and its "stop" would have been ignored
+                    if not self._stop_sent:
+                        self._stop_search()
+                    return
+                self._searching = True
+            self.infoUpdated.emit(request_id, index, line)
+
+        self.stats["searched"] += 1
+        best_move = self.engine.get_next_move(board_state, turn, on_info=on_info)
+        with self._lock:
+            self._searching = False
+            stale = self._pending is not None
+        if not stale:
+            self.moveFound.emit(request_id, best_move)
+        # A stale result is dropped, the queued wake-up of the newer request searches next
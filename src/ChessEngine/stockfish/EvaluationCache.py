@@ -0,0 +1,130 @@
+import dataclasses
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+from src.core.dataclasses.SearchResult import EngineLine, SearchResult
+from src.utils import utils
+
+"""
+Search results of positions seen before, so openings, recurring positions and positions analyzed before a restart
+don't cost a Stockfish search.
+
+Entries are keyed by an engine fingerprint (binary and the options that change results, see
+StockfishLayer.engine_fingerprint), the normalized FEN (placement, side to move, castling rights, en passant square)
+and the number of lines. They hold the deepest result searched so far, a lookup is answered by any entry at least as
+deep as requested. Recent entries are kept in memory (LRU), all of them in an SQLite file in the DeepRook cache dir.
+Only complete searches are stored, a stopped search is shallower than it says.
+
+The key has no game history: a position whose search depends on it (a repetition within reach, the 50-move rule
+close) must not be looked up or stored, StockfishLayer checks that before using the cache.
+"""
+
+SCHEMA_VERSION = 1  # Stored as the database's user_version, tables of older versions are dropped
+
+
+class EvaluationCache:
+    def __init__(self, memory_size: int = 4096, path: str | None = None):
+        self.memory_size = memory_size  # Entries in the in-memory tier
+        self.path = path or os.path.join(utils.get_temp_dir(), "DREvaluations.sqlite")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self._memory: OrderedDict[tuple[str, str, int], SearchResult] = OrderedDict()  # Least recently used first
+        try:
+            self._db = sqlite3.connect(self.path)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS evaluations")
+                self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations (engine TEXT, fen TEXT, lines INTEGER, depth INTEGER, "
+                "result TEXT, PRIMARY KEY (engine, fen, lines))"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Evaluation cache unavailable on disk, keeping it in memory only: {e}")
+            self._db = None
+
+    @staticmethod
+    def normalize_fen(fen: str) -> str:
+        return " ".join(fen.split(" ")[:4])
+
+    def lookup(self, engine: str, fen: str, depth: int, num_lines: int) -> SearchResult | None:
+        # Cached result for fen searched by the same engine setup at least depth deep with num_lines lines, its fen
+        # set to the requested one
+        key = (engine, self.normalize_fen(fen), num_lines)
+        result = self._memory.get(key)
+        if result is not None:
+            self._memory.move_to_end(key)
+            hit = "memory_hits"
+        else:
+            result = self._load(key)
+            hit = "disk_hits"
+        if result is None or result.depth < depth:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats[hit] += 1
+        if hit == "disk_hits":
+            self._remember(key, result)
+        return dataclasses.replace(result, fen=fen)
+
+    def store(self, engine: str, result: SearchResult, num_lines: int):
+        # Keeps result unless a deeper one of the same position is cached. result.depth must be the depth every line
+        # was searched to.
+        key = (engine, self.normalize_fen(result.fen), num_lines)
+        cached = self._memory.get(key) or self._load(key)
+        if cached is not None and cached.depth >= result.depth:
+            return
+        self.stats["stores"] += 1
+        self._remember(key, result)
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT INTO evaluations VALUES (?, ?, ?, ?, ?) ON CONFLICT (engine, fen, lines) DO UPDATE SET "
+                "depth = excluded.depth, result = excluded.result WHERE excluded.depth > evaluations.depth",
+                (*key, result.depth, self._serialize(result)),
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to store evaluation: {e}")
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (
+            f"{self.hit_rate():.0%} hit rate ({stats['memory_hits']} memory, {stats['disk_hits']} disk, "
+            f"{stats['misses']} misses), {len(self._memory)} positions in memory"
+        )
+
+    def _remember(self, key: tuple[str, str, int], result: SearchResult):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: tuple[str, str, int]) -> SearchResult | None:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT result FROM evaluations WHERE engine = ? AND fen = ? AND lines = ?", key
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to read evaluation: {e}")
+            return None
+        return self._deserialize(row[0]) if row else None
+
+    @staticmethod
+    def _serialize(result: SearchResult) -> str:
+        return json.dumps(dataclasses.asdict(result))
+
+    @staticmethod
+    def _deserialize(text: str) -> SearchResult:
+        data = json.loads(text)
+        data["lines"] = [EngineLine(**line) for line in data["lines"]]
+        return SearchResult(**data)
@@ -1,6 +1,15 @@
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
 from pprint import pprint
 
 from stockfish import Stockfish
+from src.core.dataclasses.BoardState import BoardState
+from src.core.dataclasses.SearchResult import EngineLine, SearchResult
+from src.ChessEngine.stockfish.EvaluationCache import EvaluationCache
 from src.utils import utils, hardcodedpathsTEMP
 from collections import Counter, deque
 
@@ -21,18 +30,37 @@ Very high depth (30-99) → Superhuman play (~Stockfish 15 at max strength).
 
 get top moves:
 get_top_moves(n)
+
+get_top_moves and get_best_move each run a full search. StockfishLayer.search runs one MultiPV search instead and
+reads the best move, the alternatives, their scores and PVs from the same output.
+
+Positions are sent as "position fen <root> moves ..." with only the newly played moves appended, set_fen_position
+would send "ucinewgame" and clear the hash every turn.
+
+Finished searches go to an EvaluationCache, a position searched before (this session or an earlier one) at least as
+deep as the current depth, by the same engine binary with the same options, is answered from it without searching.
+Positions whose search depends on the moves before them (see is_cacheable) always get a fresh search.
 """
 
+STARTING_PLACEMENT = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+
 
 class StockfishLayer:
     def __init__(self):
         self.stockfish = self.start_stockfish()
         # self.stockfish.set_skill_level(12)
         pprint(self.stockfish.get_parameters())
-        self.game_fen = None
+        self.game_fen = None  # Position the engine is on, as reported by the engine
+        self.root_fen = None  # Position the current game was set up from
+        self.game_moves: list[str] = []  # UCI moves played since root_fen
         self.fen_history = deque(maxlen=100)
         self.move_history = deque(maxlen=100)
         self.has_up = False
+        self.multipv = 2  # Lines per search: the best move and its alternatives
+        self.last_search: SearchResult | None = None
+        self.evaluation_cache = EvaluationCache()
+        # isready round trips of is_alive: count, failed checks, last and worst latency
+        self.health_stats = {"checks": 0, "failures": 0, "last_ms": 0.0, "max_ms": 0.0}
 
     @staticmethod
     def start_stockfish():
@@ -42,43 +70,34 @@ class StockfishLayer:
             print(f"[ERROR] Failed to start Stockfish: {e}")
             return None
 
-    def get_next_move(self, board_state, turn):
+    def get_next_move(self, board_state: BoardState, turn, on_info=None):
         if not self.is_alive():
             self.restart_stockfish()
 
         try:
-            self.update_game_state(board_state, turn)
-
-            if not self.stockfish.is_fen_valid(self.game_fen):
-                print(f"[ERROR] Invalid FEN passed to Stockfish: {self.game_fen}")
+            if not self.update_game_state(board_state, turn):
                 return None
             self.fen_history.append(self.game_fen)
 
-            top_moves = self.stockfish.get_top_moves(2)
-
-            if not top_moves or "Move" not in top_moves[0]:
-                print("[ERROR] Stockfish returned no valid top moves.")
-                return None
-
-            best_move = self.stockfish.get_best_move()
+            self.last_search = self.search(on_info=on_info)
+            best_move = self.last_search.best_move
 
             if not best_move:
-                print("[ERROR] Stockfish returned None for best move.")
+                print("[ERROR] Stockfish returned no valid top moves.")
                 return None
 
             print("fen history: ", self.fen_history)
+            print("evaluation cache: ", self.evaluation_cache.summary())
 
             # Detect if repeating moves
             # if self.is_draw_about_to_happen(best_move):
-            #     if len(top_moves) > 1:
-            #         best_move = top_moves[1]["Move"]
+            #     if self.last_search.alternatives:
+            #         best_move = self.last_search.alternatives[0].move
             #         print("[WARNING] Repetition detected: selecting next best move.")
             #     else:
             #         print("[WARNING] Only one move available; repetition may occur.")
 
-            # Apply the move and update FEN
-            self.stockfish.make_moves_from_current_position([best_move])
-            # self.game_fen = self.stockfish.get_fen_position()
+            # The engine stays on the searched position, the next board tells which move was actually played
             self.move_history.append(best_move)
 
             return best_move
@@ -90,6 +109,114 @@ class StockfishLayer:
             print(f"[ERROR] Exception: {type(e).__name__} - {e}")
             return None
 
+    def search(self, num_lines: int | None = None, on_info=None) -> SearchResult:
+        # One MultiPV search of the current position at the engine's depth, num_lines defaults to self.multipv.
+        # Replaces get_top_moves + get_best_move, which searched the same position twice.
+        # on_info(multipv index, EngineLine) is called for every finished line while the search runs, stop() ends it
+        # early.
+        num_lines = num_lines or self.multipv
+        if self.stockfish.get_parameters()["MultiPV"] != num_lines:
+            self.stockfish._set_option("MultiPV", num_lines)  # Stays set, the next search reuses it
+
+        fen = self.game_fen
+        depth = int(self.stockfish.depth)
+        cacheable = self.is_cacheable(depth)
+        engine = self.engine_fingerprint() if cacheable else None
+        cached = self.evaluation_cache.lookup(engine, fen, depth, num_lines) if cacheable else None
+        if cached is not None:
+            if on_info is not None:
+                for index, line in enumerate(cached.lines, start=1):
+                    on_info(index, line)
+            return cached
+
+        multiplier = 1 if fen is None or fen.split(" ")[1] == "w" else -1
+        lines: dict[int, EngineLine] = {}
+        self.stockfish._put(f"go depth {depth}")
+        while True:
+            text = self.stockfish._read_line()
+            if text.startswith("bestmove"):
+                best_move = text.split(" ")[1]
+                break
+            parsed = self.parse_info_line(text, multiplier)
+            if parsed is not None:
+                index, line = parsed
+                if index not in lines or line.depth >= lines[index].depth:
+                    lines[index] = line  # Deeper iterations replace shallower ones
+                if on_info is not None:
+                    on_info(index, line)
+
+        ordered = [lines[index] for index in sorted(lines)]
+        result = SearchResult(
+            fen, max((line.depth for line in ordered), default=0), None if best_move == "(none)" else best_move, ordered
+        )
+        # Cached only if every line reached the depth, a stopped search didn't
+        complete_depth = min((line.depth for line in ordered), default=0)
+        if cacheable and result.best_move and complete_depth >= depth:
+            self.evaluation_cache.store(engine, dataclasses.replace(result, depth=complete_depth), num_lines)
+        return result
+
+    def is_cacheable(self, depth: int) -> bool:
+        # Whether a search of the current position gives the same result whatever moves led to it. Stockfish scores
+        # a position that already occurred twice in the game as a draw, that takes 4 reversible plies the engine
+        # knows about (played since the root, halfmove clock). The 50-move rule matters once a search can reach it.
+        if self.game_fen is None:
+            return False
+        halfmove = int(self.game_fen.split(" ")[4])
+        return min(halfmove, len(self.game_moves)) < 4 and halfmove + depth < 100
+
+    def engine_fingerprint(self) -> str:
+        # Engine binary and the options that change search results, cached results of another setup don't apply.
+        # MultiPV is part of the cache key, the log file doesn't change anything.
+        path = self.stockfish._path
+        try:
+            binary = os.stat(path)
+            binary = [binary.st_size, binary.st_mtime_ns]
+        except OSError:
+            binary = None  # Found on PATH, the version has to do
+        parameters = {
+            name: value
+            for name, value in self.stockfish.get_parameters().items()
+            if name not in ("MultiPV", "Debug Log File")
+        }
+        setup = [path, binary, self.stockfish.get_stockfish_major_version(), parameters]
+        return hashlib.sha1(json.dumps(setup, sort_keys=True).encode()).hexdigest()[:12]
+
+    def stop(self):
+        # Ends a running search, Stockfish still answers with "bestmove" for what it searched so far.
+        # Safe to call from another thread while search() waits for output, ignored when no search runs.
+        self.stockfish._put("stop")
+
+    @staticmethod
+    def parse_info_line(text: str, multiplier: int = 1):
+        # (multipv index, EngineLine) of a finished "info ... multipv n score ... pv ..." line, None for anything
+        # else. Bound scores (lowerbound/upperbound) are interim results of an aspiration window and skipped.
+        tokens = text.split(" ")
+        if tokens[0] != "info" or "pv" not in tokens or "score" not in tokens or "bound" in text:
+            return None
+        score_type, score = tokens[tokens.index("score") + 1], int(tokens[tokens.index("score") + 2]) * multiplier
+        pv = tokens[tokens.index("pv") + 1 :]
+        index = int(tokens[tokens.index("multipv") + 1]) if "multipv" in tokens else 1
+        return index, EngineLine(
+            move=pv[0],
+            centipawn=score if score_type == "cp" else None,
+            mate=score if score_type == "mate" else None,
+            pv=pv,
+            depth=int(tokens[tokens.index("depth") + 1]),
+        )
+
+    @staticmethod
+    def is_position_valid(fen: str) -> bool:
+        # Cheap sanity check of a recognized position. Stockfish.is_fen_valid starts a second engine and searches
+        # the position to depth 10, per move. One king per side and no pawns on the back ranks keep the engine from
+        # crashing on misrecognized boards, a crash is still caught and restarts it.
+        if not Stockfish._is_fen_syntax_valid(fen):
+            return False
+        ranks = fen.split(" ")[0].split("/")
+        placement = "".join(ranks)
+        if placement.count("K") != 1 or placement.count("k") != 1:
+            return False
+        return not any(piece in ranks[0] + ranks[7] for piece in "Pp")
+
     def is_draw_about_to_happen(self, next_move: str) -> bool:
         """
         Simulate the move and check if it will cause the board position
@@ -125,15 +252,55 @@ class StockfishLayer:
             print(f"[ERROR] Failed to simulate repetition: {e}")
             return False
 
-    def is_alive(self):
-        if self.stockfish is None:
+    def is_alive(self, timeout: float = 1.0) -> bool:
+        # Process still running and answering "isready" with "readyok" within timeout, never starts a search.
+        # A hung engine is killed so restart_stockfish can replace it.
+        stockfish = self.stockfish  # restart_stockfish may swap it, a timed-out reader stays with this one
+        if stockfish is None:
+            return False
+        process = stockfish._stockfish
+        if process.poll() is not None:
+            self.health_stats["failures"] += 1
             return False
 
+        # Pipes can't be polled with a timeout on Windows, the blocking read runs on a helper thread instead
+        answered, abandoned = [], threading.Event()
+        reader = threading.Thread(target=self._wait_ready, args=(stockfish, answered, abandoned), daemon=True)
+        start_time = time.perf_counter()
         try:
-            self.stockfish.get_best_move()
-            return True
+            stockfish._put("isready")
         except Exception:
+            self.health_stats["failures"] += 1
+            return False
+        reader.start()
+        reader.join(timeout)
+
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        self.health_stats["checks"] += 1
+        self.health_stats["last_ms"] = latency_ms
+        self.health_stats["max_ms"] = max(self.health_stats["max_ms"], latency_ms)
+        if reader.is_alive():
+            print(f"[ERROR] Stockfish didn't answer isready within {timeout:.1f} s")
+            abandoned.set()
+            process.kill()  # Also ends the blocked read
+            self.health_stats["failures"] += 1
+            return False
+        if not answered:
+            self.health_stats["failures"] += 1
             return False
+        return True
+
+    @staticmethod
+    def _wait_ready(stockfish: Stockfish, answered: list, abandoned: threading.Event):
+        # Reads up to "readyok", dropping any output left over from an aborted search. Only reads from the engine it
+        # was started for and gives up once is_alive stopped waiting for it.
+        try:
+            while not abandoned.is_set():
+                if stockfish._read_line() == "readyok":
+                    answered.append(True)
+                    return
+        except Exception:
+            pass  # Process died while waiting
 
     def restart_stockfish(self):
         print("[ERROR] -- Stockfish crashed. Restarting...")
@@ -150,7 +317,18 @@ class StockfishLayer:
             "en_passant": fen_parts[3],  # En passant target square (e.g., "e3" or "-")
         }
 
-    def update_game_state(self, board_state, turn):
+    def update_game_state(self, board_state: BoardState, turn) -> bool:
+        # Moves the engine to the recognized position, False (engine untouched) if it isn't a valid position.
+        # Within a game the engine gets "position fen <root> moves ..." with the moves played since the last board
+        # appended, so its hash stays warm. Only a board that doesn't follow from the last one starts a new root,
+        # and only a starting position clears the hash with "ucinewgame".
+        placement = utils.board_to_fen(board_state).split(" ")[0]
+        if self.game_fen is not None:
+            moves = self._infer_moves(placement, turn)
+            if moves is not None:
+                self.game_moves += moves
+                return True
+
         if self.game_fen is None:
             castling_rights = "KQkq"
             en_passant = "-"
@@ -160,12 +338,12 @@ class StockfishLayer:
             fen_parts = self.game_fen.split(" ")
             # castling_rights = fen_parts[2] if len(fen_parts) > 2 else "-"
             castling_rights = utils.infer_castling_rights(board_state)
-            en_passant = fen_parts[3] if len(fen_parts) > 3 else "-"
+            en_passant = "-"  # The engine's square belongs to the last position, this board doesn't follow from it
             halfmove = fen_parts[4] if len(fen_parts) > 4 else "0"
             fullmove = fen_parts[5] if len(fen_parts) > 5 else "1"
 
         # Generate updated FEN
-        self.game_fen = utils.board_to_fen(
+        fen = utils.board_to_fen(
             board_state=board_state,
             turn=turn,
             castling_rights=castling_rights,
@@ -173,6 +351,68 @@ class StockfishLayer:
             halfmove=halfmove,
             fullmove=fullmove,
         )
+        if not self.is_position_valid(fen):
+            print(f"[ERROR] Invalid FEN passed to Stockfish: {fen}")
+            return False
 
-        # Set the updated FEN position in Stockfish
-        self.stockfish.set_fen_position(self.game_fen)
+        if self.game_fen is None or placement == STARTING_PLACEMENT:
+            self.stockfish._put("ucinewgame")  # New game: the old hash entries can't help anymore
+            self.stockfish._is_ready()
+        self.root_fen, self.game_moves = fen, []
+        self.game_fen = self._position_after([])
+        return True
+
+    def _position_after(self, moves: list[str]) -> str:
+        # Sets the engine to the game root plus the moves played so far plus moves and returns its FEN. Stockfish
+        # stops at an illegal move, the returned FEN then doesn't show the last moves.
+        command = f"position fen {self.root_fen}"
+        if self.game_moves or moves:
+            command += " moves " + " ".join(self.game_moves + moves)
+        self.stockfish._put(command)
+        return self.stockfish.get_fen_position()
+
+    def _legal_moves(self) -> list[str]:
+        # Legal moves in the engine's current position from "go perft 1", which counts moves without searching
+        self.stockfish._put("go perft 1")
+        moves = []
+        while True:
+            text = self.stockfish._read_line()
+            if text.startswith("Nodes searched"):
+                return moves
+            if ": " in text and not text.startswith("info"):
+                moves.append(text.split(":")[0])
+
+    def _infer_moves(self, placement: str, turn) -> list[str] | None:
+        # Moves played between the engine's position and the recognized placement with turn to move, checked by
+        # letting the engine play them. None if the board doesn't follow from the last one by one or two plies.
+        fen_parts = self.game_fen.split(" ")
+        if fen_parts[0] == placement and fen_parts[1] == turn:
+            self._position_after([])  # Same position, resent in case the engine was restarted
+            return []
+
+        before, after = utils.expand_fen_board(fen_parts[0]), utils.expand_fen_board(placement)
+        mover = fen_parts[1]
+        if mover != turn:
+            candidates = [[utils.infer_move(before, after, mover)]]
+        else:
+            # Our move and the opponent's reply. Ours is usually one of the searched lines, else it's read off the
+            # board. If the reply captured the moved piece, every legal move from a square we left is tried.
+            first_moves = [line.move for line in self.last_search.lines] if self.last_search else []
+            first_moves.append(utils.infer_move(before, after, mover))
+            own = str.isupper if mover == "w" else str.islower
+            vacated = {utils.square_name(i) for i in range(64) if own(before[i]) and not own(after[i])}
+            self._position_after([])
+            first_moves += [move for move in self._legal_moves() if move[:2] in vacated]
+            candidates = []
+            for first in dict.fromkeys(move for move in first_moves if move):
+                middle = utils.expand_fen_board(self._position_after([first]).split(" ")[0])
+                candidates.append([first, utils.infer_move(middle, after, "b" if mover == "w" else "w")])
+
+        for moves in candidates:
+            if None in moves:
+                continue
+            fen = self._position_after(moves)
+            if fen.split(" ")[:2] == [placement, turn]:
+                self.game_fen = fen
+                return moves
+        return None
@@ -1,6 +1,10 @@
+import os
+
 from src.core.ConfigManager import ConfigManager
 from src.core.dataclasses.BotParams import BotParams
+from src.core.enums.DropPolicy import DropPolicy
 from src.core.enums.Hotkeys import Hotkey
+from src.logger.AppLogger import AppLogger
 from src.session.SessionData import SessionData
 from src.utils import utils
 
@@ -15,6 +19,29 @@ def prepare_app():
     session.engine_rating = config.get("engine_rating", 3000)
     session.temp_chessboard_image = config.get("temp_chessboard_image", None)
     session.model_path = config.get("model_path", "")
+    session.cnn_backend = config.get("cnn_backend", "numpy")
+    session.capture_drop_policy = config.get("capture_drop_policy", DropPolicy.DROP_OLDEST.value)
+    if session.capture_drop_policy not in [policy.value for policy in DropPolicy]:
+        AppLogger.warn(f"Unknown capture_drop_policy '{session.capture_drop_policy}' in config, using drop_oldest")
+        session.capture_drop_policy = DropPolicy.DROP_OLDEST.value
+    capture_cpu_budget = config.get("capture_cpu_budget", 0.25)
+    if not isinstance(capture_cpu_budget, (int, float)) or capture_cpu_budget <= 0:
+        AppLogger.warn(f"Invalid capture_cpu_budget '{capture_cpu_budget}' in config, using 0.25")
+        capture_cpu_budget = 0.25
+    session.capture_cpu_budget = capture_cpu_budget
+    session.capture_source = config.get("capture_source", "mss")
+    session.replay_path = config.get("replay_path", "")
+    if session.capture_source not in ("mss", "replay"):
+        AppLogger.warn(f"Unknown capture_source '{session.capture_source}' in config, using mss")
+        session.capture_source = "mss"
+    elif session.capture_source == "replay" and not os.path.exists(session.replay_path):
+        AppLogger.warn(f"Replay path '{session.replay_path}' in config doesn't exist, using mss")
+        session.capture_source = "mss"
+    replay_speed = config.get("replay_speed", 1.0)
+    if not isinstance(replay_speed, (int, float)) or replay_speed < 0:
+        AppLogger.warn(f"Invalid replay_speed '{replay_speed}' in config, using 1.0")
+        replay_speed = 1.0
+    session.replay_speed = replay_speed
 
     if not session.model_path:
         model_path = utils.get_model_path()
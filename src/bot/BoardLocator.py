@@ -0,0 +1,273 @@
+import cv2
+import numpy as np
+
+from src.core.dataclasses.BoardGrid import BoardGrid
+
+"""
+Finds the 8x8 chessboard grid in a screen frame, at any scale and without a template.
+
+The lines between squares of a checkerboard carry brightness steps of both signs (light->dark and dark->light
+alternate along the line), while window borders, text and icons mostly don't. Per column (and row) the positive and
+negative gradient sums are multiplied, and a comb of 7 equally spaced internal lines is fitted to that profile,
+first on a downsampled frame over all square sizes, then at full resolution around the coarse hit.
+
+The found rectangle is cached together with one pixel per square. Later frames only re-sample those 64 pixels
+(revalidate); the full search runs again only when too many of them changed.
+
+refine_grid fits the same comb with sub-pixel precision inside a selected region, for regions that are a few pixels
+off the board.
+"""
+
+
+def _to_gray(frame: np.ndarray) -> np.ndarray:
+    if frame.ndim == 2:
+        return frame
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+
+
+def line_profile(gray: np.ndarray, axis: int) -> np.ndarray:
+    # Two-signed edge evidence per position along axis (1: vertical lines per column, 0: horizontal per row).
+    # Entry i is the boundary in front of pixel i.
+    grad = np.diff(gray.astype(np.int16), axis=axis)
+    across = 1 - axis
+    positive = np.clip(grad, 0, None).sum(axis=across, dtype=np.float32)
+    negative = np.clip(grad, None, 0).sum(axis=across, dtype=np.float32)
+    return np.concatenate(([0.0], np.sqrt(-positive * negative))).astype(np.float32)
+
+
+def fit_comb(profile: np.ndarray, sizes: np.ndarray, offsets: np.ndarray | None = None, top: int = 1):
+    # Best (score, offset, square size) for 7 internal lines at offset + k * size, scored as the mean evidence on
+    # the lines minus the mean half a square off them. Returns up to `top` hits with distinct offsets.
+    k = np.arange(1, 8)
+    hits = []
+    for size in sizes:
+        last = len(profile) - int(np.ceil(8 * size))
+        candidates = np.arange(0, last + 1) if offsets is None else offsets[(offsets >= 0) & (offsets <= last)]
+        if len(candidates) == 0:
+            continue
+        on_lines = profile[candidates[:, None] + np.round(k * size).astype(int)].mean(axis=1)
+        between = profile[candidates[:, None] + np.round((k - 0.5) * size).astype(int)].mean(axis=1)
+        scores = on_lines - between
+        best = int(np.argmax(scores))
+        hits.append((float(scores[best]), int(candidates[best]), float(size)))
+
+    hits.sort(reverse=True)
+    distinct = []
+    for hit in hits:
+        if all(abs(hit[1] - other[1]) > hit[2] / 2 or abs(hit[2] - other[2]) > hit[2] / 8 for other in distinct):
+            distinct.append(hit)
+        if len(distinct) == top:
+            break
+    return distinct
+
+
+def _grid_lines(gray: np.ndarray, axis: int, slack: float, min_contrast: float = 4.0):
+    # (first line, square size) along one axis of a roughly selected board, lines may lie up to slack squares
+    # outside the image or inside it. The comb gives approximate lines, a parabola through each internal line's peak
+    # and a least squares fit over the 7 of them add the sub-pixel part.
+    length = gray.shape[1 - axis]
+    margin = int(np.ceil(slack * length / 8))
+    profile = line_profile(gray, axis)
+    # Zero padding lets the comb start before the image, for regions cut a few pixels into the board
+    padded = np.concatenate((np.zeros(margin, np.float32), profile, np.zeros(margin, np.float32)))
+    sizes = np.arange((length - 2 * margin) / 8, (length + 2 * margin) / 8, 0.05)
+    hits = fit_comb(padded, sizes, np.arange(0, 2 * margin + 1))
+    if not hits or hits[0][0] <= 0:
+        return None
+    _, offset, size = hits[0]
+
+    # The comb's size steps and rounding can miss thin lines by a pixel per square, each line's peak is searched
+    # within an eighth of a square
+    radius = max(2, int(size / 8))
+    positions = []
+    for k in range(1, 8):
+        expected = int(round(offset - margin + k * size))
+        start = max(expected - radius, 0)
+        window = profile[start : expected + radius + 1]
+        if len(window) == 0:
+            return None
+        peak = start + int(np.argmax(window))
+        if peak < 1 or peak >= len(profile) - 1:
+            return None
+        before, center, after = profile[peak - 1 : peak + 2]
+        curvature = before - 2 * center + after
+        positions.append(peak + (0.5 * (before - after) / curvature if curvature < 0 else 0.0))
+
+    # Any texture fits some comb: a board's lines stand far out of the average column (row), noise and UI don't
+    peaks = profile[np.round(positions).astype(int)]
+    if peaks.mean() < min_contrast * profile.mean():
+        return None
+
+    size, first = np.polyfit(np.arange(1, 8), positions, 1)
+    return float(first), float(size)
+
+
+def refine_grid(board: np.ndarray, slack: float = 0.25) -> BoardGrid | None:
+    # Exact square grid of a hand-drawn or detected board region (RGB or BGRA), None if no grid is found.
+    # The region may be off by up to slack squares on every side.
+    gray = _to_gray(board)
+    x_fit, y_fit = _grid_lines(gray, 1, slack), _grid_lines(gray, 0, slack)
+    if x_fit is None or y_fit is None:
+        return None
+    (left, size_x), (top, size_y) = x_fit, y_fit
+    if abs(size_x - size_y) > 0.05 * size_x:
+        return None  # Boards are square
+    return BoardGrid(left, top, size_x, size_y)
+
+
+class BoardLocator:
+    def __init__(
+        self,
+        min_square: int = 16,
+        coarse_size: int = 800,
+        color_tolerance: int = 24,
+        min_matching: int = 56,
+        candidates: int = 5,
+    ):
+        self.min_square = min_square  # Smallest square edge in pixels that is searched for
+        self.coarse_size = coarse_size  # Longer frame side of the coarse search
+        self.color_tolerance = color_tolerance  # Max channel difference of a revalidated square pixel
+        self.min_matching = min_matching  # Squares (of 64) that must match, leaves room for highlights and moves
+        self.candidates = candidates  # Coarse column hits that get refined and checked
+        self.region = None  # Cached (x, y, w, h) on the monitor
+        self._samples = None  # ((ys, xs), colors) of one pixel per square of the cached region
+        self.stats = {"detections": 0, "revalidations": 0, "revalidation_failures": 0}
+
+    def invalidate(self):
+        self.region = None
+        self._samples = None
+
+    def locate(self, frame: np.ndarray, origin=(0, 0)):
+        # Cached region if it still holds, otherwise a full search. origin is the frame's position on the monitor.
+        if self.region is not None:
+            if self.revalidate(frame, origin):
+                return self.region
+            self.stats["revalidation_failures"] += 1
+
+        self.stats["detections"] += 1
+        region = self.detect(frame)
+        if region is None:
+            self.invalidate()
+            return None
+        x, y, w, h = region
+        self.remember(frame, (x + origin[0], y + origin[1], w, h), origin)
+        return self.region
+
+    def remember(self, frame: np.ndarray, region, origin=(0, 0)):
+        # Caches region and samples its square pixels for cheap revalidation
+        points = self._sample_points(region, origin)
+        self.region = tuple(region)
+        self._samples = (points, frame[points][..., :3].astype(np.int16))
+
+    def revalidate(self, frame: np.ndarray, origin=(0, 0)) -> bool:
+        # 64 pixel reads instead of a search: the cached board is still there if enough squares kept their color
+        if self.region is None:
+            return False
+        self.stats["revalidations"] += 1
+        points = self._sample_points(self.region, origin)
+        height, width = frame.shape[:2]
+        if points[0].min() < 0 or points[1].min() < 0 or points[0].max() >= height or points[1].max() >= width:
+            return False
+        diff = np.abs(frame[points][..., :3].astype(np.int16) - self._samples[1]).max(axis=1)
+        return int((diff <= self.color_tolerance).sum()) >= self.min_matching
+
+    @staticmethod
+    def _sample_points(region, origin=(0, 0)):
+        # One pixel per square, left of center: clear of pieces (narrow at mid height) and coordinate labels
+        x, y, w, h = region
+        cols = np.arange(8)
+        xs = np.round(x - origin[0] + (cols + 0.1) * w / 8).astype(int)
+        ys = np.round(y - origin[1] + (cols + 0.5) * h / 8).astype(int)
+        grid_y, grid_x = np.meshgrid(ys, xs, indexing="ij")
+        return grid_y.ravel(), grid_x.ravel()
+
+    def detect(self, frame: np.ndarray):
+        # Full search, returns (x, y, w, h) in frame pixels or None
+        gray = _to_gray(frame)
+        scale = min(self.coarse_size / max(gray.shape), 1.0)
+        coarse = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+
+        best = None
+        for rect in self._coarse_candidates(coarse, self.min_square * scale):
+            rect = self._refine(gray, [value / scale for value in rect], scale)
+            if rect is None:
+                continue
+            # The comb can lock onto the board's outer edge or clutter next to it and land a few squares off,
+            # the checker test decides between the shifted grids
+            x, y, size_x, size_y = rect
+            for dx in range(-3, 4):
+                for dy in range(-3, 4):
+                    shifted = (x + dx * size_x, y + dy * size_y, size_x, size_y)
+                    score = self._checker_score(gray, shifted)
+                    if score is not None and (best is None or score > best[0]):
+                        best = (score, shifted)
+
+        if best is None:
+            return None
+        x, y, size_x, size_y = best[1]
+        return int(round(x)), int(round(y)), int(round(8 * size_x)), int(round(8 * size_y))
+
+    def _coarse_candidates(self, gray, min_square):
+        # (x, y, square w, square h) candidates on the coarse frame. Columns are searched over the full height first,
+        # then rows within each column hit, then columns again within the rows, so a small board isn't drowned out.
+        height, width = gray.shape
+        sizes = np.arange(max(min_square, 4.0), min(height, width) / 8, 0.25)
+        if len(sizes) == 0:
+            return []
+
+        rects = []
+        for _, x, size_x in fit_comb(line_profile(gray, axis=1), sizes, top=self.candidates):
+            band = gray[:, x : int(x + 8 * size_x) + 1]
+            y_hits = fit_comb(line_profile(band, axis=0), self._near(size_x, 0.1), top=1)
+            if not y_hits:
+                continue
+            _, y, size_y = y_hits[0]
+            band = gray[y : int(y + 8 * size_y) + 1]
+            x_hits = fit_comb(line_profile(band, axis=1), self._near(size_y, 0.1), top=1)
+            if x_hits:
+                _, x, size_x = x_hits[0]
+                rects.append((x, y, size_x, size_y))
+        return rects
+
+    @staticmethod
+    def _near(size, tolerance, step=0.25):
+        return np.arange(size * (1 - tolerance), size * (1 + tolerance) + step, step)
+
+    def _refine(self, gray, rect, scale):
+        # Full resolution fit around a coarse hit: offsets within a few coarse pixels, sizes within 2 %
+        x, y, size_x, size_y = rect
+        slack = int(np.ceil(2 / scale)) + 1
+        height, width = gray.shape
+        top, bottom = max(int(y) - slack, 0), min(int(y + 8 * size_y) + slack, height)
+        left, right = max(int(x) - slack, 0), min(int(x + 8 * size_x) + slack, width)
+
+        offsets = np.arange(-slack, slack + 1)
+        x_hits = fit_comb(
+            line_profile(gray[top:bottom], axis=1), self._near(size_x, 0.02, 0.05), offsets + int(round(x))
+        )
+        y_hits = fit_comb(
+            line_profile(gray[:, left:right], axis=0), self._near(size_y, 0.02, 0.05), offsets + int(round(y))
+        )
+        if not x_hits or not y_hits:
+            return None
+        (_, x, size_x), (_, y, size_y) = x_hits[0], y_hits[0]
+        if abs(size_x - size_y) > 0.05 * size_x:
+            return None  # Boards are square
+        return x, y, size_x, size_y
+
+    def _checker_score(self, gray, rect):
+        # (matching squares, light/dark gray gap) if the rectangle shows a checker pattern, None otherwise.
+        # Samples both sides of every square, so a rectangle one square off the board can't match.
+        x, y, size_x, size_y = rect
+        if x < 0 or y < 0 or x + 8 * size_x >= gray.shape[1] or y + 8 * size_y >= gray.shape[0]:
+            return None
+        ys, xs = self._sample_points((x, y, 8 * size_x, 8 * size_y))
+        values = np.stack([gray[ys, xs], gray[ys, np.round(xs + 0.8 * size_x).astype(int)]]).astype(np.float32)
+        parity = ((np.arange(8)[:, None] + np.arange(8)[None, :]) % 2 == 0).ravel()
+        first, second = np.median(values[:, parity]), np.median(values[:, ~parity])
+        contrast = abs(first - second)
+        if contrast < 20:
+            return None
+        expected = np.where(parity, first, second)
+        matching = int((np.abs(values - expected) <= max(12.0, contrast / 3)).all(axis=0).sum())
+        return (matching, float(contrast)) if matching >= self.min_matching else None
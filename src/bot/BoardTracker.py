@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+
+"""
+Follows the selected board when the page scrolls or the browser window moves.
+
+Every live frame of the selected region is downsampled and phase-correlated against a reference crop of the same
+region. A clear peak off the origin is the board's translation, the region is moved by it and the reference moves
+along. Shifts beyond half a square are not trusted (the checker pattern repeats every two squares) and, like a
+missing peak, report the board as lost, the caller then falls back to a full BoardLocator search.
+"""
+
+
+class BoardTracker:
+    def __init__(
+        self,
+        thumbnail_size: int = 256,
+        max_shift: float = 0.5,
+        min_response: float = 0.1,
+        refresh_response: float = 0.4,
+    ):
+        self.thumbnail_size = thumbnail_size  # Longer side of the downsampled region
+        self.max_shift = max_shift  # Largest trusted shift, in squares
+        self.min_response = min_response  # Weaker correlation peaks mean the board is gone or covered
+        self.refresh_response = refresh_response  # Below this the content changed in place (a move), re-anchor
+        self.stats = {"frames": 0, "moves": 0, "lost": 0}
+        self._reference = None  # float32 gray thumbnail of the region the shifts are measured against
+        self._scale = 1.0  # Thumbnail pixels per region pixel
+        self._window = None  # Hanning window against edge effects, cached per thumbnail shape
+
+    def reset(self):
+        # Call when the region is changed by anything but the tracker, the next frame becomes the reference
+        self._reference = None
+
+    def _thumbnail(self, board: np.ndarray) -> np.ndarray:
+        # Accepts RGB or BGRA (a live capture crop), the resize runs first so only the thumbnail is converted
+        height, width = board.shape[:2]
+        self._scale = min(self.thumbnail_size / max(height, width), 1.0)
+        size = (max(int(width * self._scale), 1), max(int(height * self._scale), 1))
+        thumbnail = cv2.resize(board, size, interpolation=cv2.INTER_LINEAR)
+        to_gray = cv2.COLOR_BGRA2GRAY if board.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        return cv2.cvtColor(thumbnail, to_gray).astype(np.float32)
+
+    def track(self, board: np.ndarray):
+        # Feeds the current crop of the selected region. Returns the board's (dx, dy) in whole region pixels,
+        # (0, 0) while it stays put, or None if it was lost. A lost board re-anchors on this frame.
+        self.stats["frames"] += 1
+        thumbnail = self._thumbnail(board)
+        if self._reference is None or self._reference.shape != thumbnail.shape:
+            self._reference = thumbnail
+            self._window = cv2.createHanningWindow(thumbnail.shape[::-1], cv2.CV_32F)
+            return 0, 0
+
+        (shift_x, shift_y), response = cv2.phaseCorrelate(self._reference, thumbnail, self._window)
+        dx, dy = shift_x / self._scale, shift_y / self._scale
+        square = max(board.shape[:2]) / 8
+        if response < self.min_response or max(abs(dx), abs(dy)) > self.max_shift * square:
+            self.stats["lost"] += 1
+            self._reference = thumbnail
+            return None
+
+        dx, dy = int(round(dx)), int(round(dy))
+        if dx or dy:
+            # The caller moves the region by (dx, dy): this frame seen through the moved region is the new reference,
+            # so motion during the next frame still counts
+            self.stats["moves"] += 1
+            matrix = np.float32([[1, 0, -dx * self._scale], [0, 1, -dy * self._scale]])
+            self._reference = cv2.warpAffine(thumbnail, matrix, thumbnail.shape[::-1], borderMode=cv2.BORDER_REPLICATE)
+        elif response < self.refresh_response:
+            self._reference = thumbnail
+        return dx, dy
@@ -24,11 +24,11 @@ def move_mouse_win(x, y):
     ctypes.windll.user32.SetCursorPos(int(x), int(y))
 
 
-def move_piece_human(move, board_coords, delay_ms=0.2):
+def move_piece_human(move, board_coords, delay_ms=0.2, grid=None):
     start_square, end_square = move[:2], move[2:]
 
-    start_x, start_y = Board.get_square_position(start_square, board_coords)
-    end_x, end_y = Board.get_square_position(end_square, board_coords)
+    start_x, start_y = Board.get_square_position(start_square, board_coords, grid)
+    end_x, end_y = Board.get_square_position(end_square, board_coords, grid)
 
     pyautogui.moveTo(start_x, start_y, duration=delay_ms)
     pyautogui.mouseDown()
@@ -37,11 +37,11 @@ def move_piece_human(move, board_coords, delay_ms=0.2):
     pyautogui.mouseUp()
 
 
-def move_piece_hyper(move, board_coords):
+def move_piece_hyper(move, board_coords, grid=None):
     start_square, end_square = move[:2], move[2:]
 
-    start_x, start_y = Board.get_square_position(start_square, board_coords)
-    end_x, end_y = Board.get_square_position(end_square, board_coords)
+    start_x, start_y = Board.get_square_position(start_square, board_coords, grid)
+    end_x, end_y = Board.get_square_position(end_square, board_coords, grid)
 
     pyautogui.moveTo(start_x, start_y)
     pyautogui.mouseDown()
@@ -49,11 +49,11 @@ def move_piece_hyper(move, board_coords):
     pyautogui.mouseUp()
 
 
-def move_piece_hypersonic(move, board_coords):
+def move_piece_hypersonic(move, board_coords, grid=None):
     start_square, end_square = move[:2], move[2:]
 
-    start_x, start_y = Board.get_square_position(start_square, board_coords)
-    end_x, end_y = Board.get_square_position(end_square, board_coords)
+    start_x, start_y = Board.get_square_position(start_square, board_coords, grid)
+    end_x, end_y = Board.get_square_position(end_square, board_coords, grid)
 
     move_mouse_win(start_x, start_y)
     mouse_down_win()
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+
+class BoardChangeDetector(QObject):
+    # Gate in front of recognition: compares downsampled grayscale frames of the board region and emits
+    # boardSettled once the board differs from the last settled state and has been still for settle_frames frames.
+    boardSettled = Signal()
+
+    def __init__(self, settle_frames: int = 3, motion_threshold: float = 6.0, thumbnail_size: int = 64, parent=None):
+        super().__init__(parent)
+        self.settle_frames = settle_frames
+        self.motion_threshold = motion_threshold  # Mean absolute gray difference of a single tile
+        self.thumbnail_size = thumbnail_size  # Multiple of 8, one thumbnail block per square
+        self.stats = {"frames_seen": 0, "frames_filtered": 0, "settled": 0}
+        self.reset()
+
+    def reset(self):
+        # Forget the previous frames, call when the region changes. The next still board fires an event.
+        self._previous = None
+        self._settled = None
+        self._still_frames = 0
+
+    def _thumbnail(self, board: np.ndarray) -> np.ndarray:
+        # Accepts RGB or BGRA (a live capture crop), the resize runs first so only the thumbnail is converted
+        size = (self.thumbnail_size, self.thumbnail_size)
+        to_gray = cv2.COLOR_BGRA2GRAY if board.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        return cv2.cvtColor(cv2.resize(board, size, interpolation=cv2.INTER_AREA), to_gray)
+
+    def _max_tile_diff(self, a: np.ndarray, b: np.ndarray) -> float:
+        # Largest per-square mean difference, a moved piece doesn't get diluted by 62 unchanged squares
+        block = self.thumbnail_size // 8
+        diff = cv2.absdiff(a, b).reshape(8, block, 8, block)
+        return float(diff.mean(axis=(1, 3)).max())
+
+    def process(self, board: np.ndarray) -> bool:
+        # Feeds one frame of the board region, returns True (and emits boardSettled) if it settled a change
+        self.stats["frames_seen"] += 1
+        thumbnail = self._thumbnail(board)
+
+        moving = self._previous is not None and self._max_tile_diff(thumbnail, self._previous) > self.motion_threshold
+        self._still_frames = 0 if moving else self._still_frames + 1
+        self._previous = thumbnail
+
+        # Still frames keep being compared with the settled board, a drift too slow to count as motion between two
+        # frames still adds up to a change
+        if self._still_frames < self.settle_frames or (
+            self._settled is not None and self._max_tile_diff(thumbnail, self._settled) <= self.motion_threshold
+        ):
+            self.stats["frames_filtered"] += 1
+            return False
+
+        self._settled = thumbnail
+        self.stats["settled"] += 1
+        self.boardSettled.emit()
+        return True
@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class BoardGrid:
+    # Square grid inside the selected region, in region pixels with sub-pixel precision.
+    # Lines sit on pixel edges: x = 0 is the left edge of the region's first column, square (row, col) spans
+    # [left + col * square_width, left + (col + 1) * square_width) horizontally. Row 0 is the top row on screen.
+    left: float
+    top: float
+    square_width: float
+    square_height: float
+
+    @classmethod
+    def uniform(cls, width: int, height: int) -> "BoardGrid":
+        # The region is taken as the board, split with integer // 8 like before grid refinement
+        return cls(0.0, 0.0, float(width // 8), float(height // 8))
+
+    def x_lines(self) -> np.ndarray:
+        # The 9 vertical lines, outer board edges included
+        return self.left + np.arange(9) * self.square_width
+
+    def y_lines(self) -> np.ndarray:
+        return self.top + np.arange(9) * self.square_height
+
+    def square_center(self, row: int, col: int) -> tuple[float, float]:
+        return self.left + (col + 0.5) * self.square_width, self.top + (row + 0.5) * self.square_height
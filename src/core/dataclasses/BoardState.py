@@ -0,0 +1,40 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+# CNN output classes, the index of a label is its class index
+CLASS_LABELS = ["bB", "bK", "bN", "bP", "bQ", "bR", "empty", "wB", "wK", "wN", "wP", "wQ", "wR"]
+EMPTY_CLASS = CLASS_LABELS.index("empty")
+
+# FEN symbol per class index, "1" marks an empty square
+_FEN_SYMBOLS = np.array(list("bknpqr1BKNPQR"))
+_EMPTY_RUNS = re.compile("1+")
+
+
+@dataclass(eq=False)
+class BoardState:
+    # Recognized board: row 0 is rank 8, column 0 is the a-file
+    classes: np.ndarray  # (8, 8) uint8 class indices into CLASS_LABELS
+    confidences: np.ndarray  # (8, 8) float16 confidence in percent
+
+    def __eq__(self, other):
+        return isinstance(other, BoardState) and np.array_equal(self.classes, other.classes)
+
+    def label_at(self, row: int, col: int) -> str:
+        return CLASS_LABELS[self.classes[row, col]]
+
+    def labels(self) -> np.ndarray:
+        # (8, 8) array of label strings, only built when asked for
+        return np.asarray(CLASS_LABELS)[self.classes]
+
+    def labels_with_confidence(self) -> list[list[str]]:
+        return [
+            [f"{CLASS_LABELS[c]} ({conf:.2f}%)" for c, conf in zip(row, conf_row)]
+            for row, conf_row in zip(self.classes, self.confidences)
+        ]
+
+    def to_fen_board(self) -> str:
+        # Piece placement field of a FEN string
+        rows = ("".join(row) for row in _FEN_SYMBOLS[self.classes])
+        return "/".join(_EMPTY_RUNS.sub(lambda m: str(len(m.group())), row) for row in rows)
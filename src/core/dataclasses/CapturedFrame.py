@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class CapturedFrame:
+    image: np.ndarray  # (h, w, 4) BGRA view into a ring buffer slot as grabbed, only valid while the frame is held
+    origin: tuple[int, int]  # (x, y) of the top-left corner relative to the monitor
+    number: int  # Increasing frame counter, starts at 1
+    timestamp: float  # time.perf_counter() of the grab
+    slot: int
+
+    def crop(self, x: int, y: int, w: int, h: int) -> np.ndarray | None:
+        # View of a monitor-relative region, None if the frame doesn't fully cover it
+        left, top = x - self.origin[0], y - self.origin[1]
+        height, width = self.image.shape[:2]
+        if left < 0 or top < 0 or left + w > width or top + h > height:
+            return None
+        return self.image[top : top + h, left : left + w]
+
+    def crop_rgb(self, x: int, y: int, w: int, h: int) -> np.ndarray | None:
+        # RGB copy of a monitor-relative region for the recognizer, only the crop is converted
+        crop = self.crop(x, y, w, h)
+        return cv2.cvtColor(crop, cv2.COLOR_BGRA2RGB) if crop is not None else None
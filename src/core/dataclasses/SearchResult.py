@@ -0,0 +1,24 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class EngineLine:
+    # One MultiPV line. Scores are from White's point of view like Stockfish.get_top_moves, one of them is None.
+    move: str
+    centipawn: int | None
+    mate: int | None
+    pv: list[str]
+    depth: int
+
+
+@dataclass
+class SearchResult:
+    # Everything a single engine search returns: best move, alternatives ordered best first, scores and PVs
+    fen: str
+    depth: int
+    best_move: str | None  # None if the side to move is mated or stalemated
+    lines: list[EngineLine] = field(default_factory=list)
+
+    @property
+    def alternatives(self) -> list[EngineLine]:
+        return self.lines[1:]
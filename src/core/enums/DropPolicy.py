@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class DropPolicy(Enum):
+    # What the capture ring buffer does with a new frame when consumers fall behind
+    DROP_OLDEST = "drop_oldest"  # Overwrite the oldest unread frame, consumers always see the newest one
+    DROP_NEWEST = "drop_newest"  # Skip the new frame, unread frames stay until a consumer catches up
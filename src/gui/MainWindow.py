@@ -47,6 +47,12 @@ class MainWindow(QMainWindow):
             "engine_rating": self.session_data.engine_rating,
             "temp_chessboard_image": self.session_data.temp_chessboard_image,
             "model_path": self.session_data.model_path,
+            "cnn_backend": self.session_data.cnn_backend,
+            "capture_drop_policy": self.session_data.capture_drop_policy,
+            "capture_cpu_budget": self.session_data.capture_cpu_budget,
+            "capture_source": self.session_data.capture_source,
+            "replay_path": self.session_data.replay_path,
+            "replay_speed": self.session_data.replay_speed,
             "bot_params": {
                 "start_delay": self.session_data.bot_params.start_delay,
                 "human_mouse_movements": self.session_data.bot_params.human_mouse_movements,
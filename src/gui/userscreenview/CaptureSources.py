@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+"""
+Capture sources behind ScreenCapture and ScreenRegionSelector.
+
+Every source hands out (h, w, 4) BGRA frames of an mss-style area ({"left", "top", "width", "height"} in absolute
+desktop coordinates) and lists its monitors the way mss does: index 0 is the whole desktop, 1.. are the monitors.
+
+MssCaptureSource grabs the real screen. ReplayCaptureSource streams a video file or an image directory as a single
+virtual monitor, at real, accelerated (speed > 1) or unthrottled (speed 0, one frame per grab) speed, so the
+recognition and engine pipeline can be benchmarked on a headless box.
+"""
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class CaptureSource:
+    name = ""
+    # mss handles are bound to the thread that created them, such sources are created once per thread.
+    # Other sources are shared between the GUI and the capture thread.
+    thread_bound = False
+
+    def monitors(self) -> list[dict]:
+        raise NotImplementedError
+
+    def grab(self, area: dict, advance: bool = True) -> np.ndarray:
+        # advance=False reads the current frame of a replay without stepping it, for snapshots the GUI takes while
+        # the capture thread drives the replay. Live sources always grab the screen.
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MssCaptureSource(CaptureSource):
+    name = "mss"
+    thread_bound = True
+
+    def __init__(self):
+        import mss  # Lazy import, not needed for replays
+
+        self._sct = mss.mss()
+
+    def monitors(self) -> list[dict]:
+        return self._sct.monitors
+
+    def grab(self, area: dict, advance: bool = True) -> np.ndarray:
+        # View of the grabbed pixels, the array keeps the mss screenshot alive
+        return np.asarray(self._sct.grab(area))
+
+    def close(self):
+        self._sct.close()
+
+
+class ReplayCaptureSource(CaptureSource):
+    name = "replay"
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True, image_fps: float = 1.0):
+        # speed scales the recorded frame rate (image directories play at image_fps), 0 advances one frame per grab
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.finished = False
+
+        self._lock = threading.Lock()
+        if os.path.isdir(path):
+            self._images = sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not self._images:
+                raise FileNotFoundError(f"No images found in {path}")
+            self._video = None
+            self.frame_count, self.frame_rate = len(self._images), image_fps
+        else:
+            self._images = None
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise FileNotFoundError(f"Cannot open replay video: {path}")
+            self.frame_count = int(self._video.get(cv2.CAP_PROP_FRAME_COUNT)) or None  # None if unknown
+            self.frame_rate = self._video.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self._frame = None  # Current frame as BGRA
+        self._index = -1  # Index of the current frame
+        self._video_index = -1  # Index of the frame the video decoder returned last
+        self._start_time = None
+        self._load_frame(0)
+        if self._frame is None:
+            self.close()
+            raise ValueError(f"No readable frame in replay: {path}")
+
+    def monitors(self) -> list[dict]:
+        height, width = self._frame.shape[:2]
+        monitor = {"left": 0, "top": 0, "width": width, "height": height}
+        return [monitor, dict(monitor)]
+
+    def grab(self, area: dict, advance: bool = True) -> np.ndarray:
+        # Copy of the area in the frame that is due now (the current one without advance), clamped to the frame
+        with self._lock:
+            if advance:
+                self._advance()
+            left, top = max(area["left"], 0), max(area["top"], 0)
+            crop = self._frame[top : area["top"] + area["height"], left : area["left"] + area["width"]]
+            return crop.copy()
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+
+    def _due_index(self) -> int:
+        if self.speed <= 0:
+            return self._index + 1
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+        return int((time.perf_counter() - self._start_time) * self.speed * self.frame_rate)
+
+    def _advance(self):
+        index = self._due_index()
+        if self.frame_count and index >= self.frame_count:
+            if not self.loop:
+                self.finished = True
+                return  # Keep showing the last frame
+            index %= self.frame_count
+        if index != self._index:
+            self._load_frame(index)
+
+    def _load_frame(self, index: int):
+        if self._images is not None:
+            frame = cv2.imread(self._images[index], cv2.IMREAD_COLOR)
+        else:
+            frame = self._read_video_frame(index)
+            if frame is None and index > 0:  # Frame count was unknown or wrong: the video ended here
+                self.frame_count = index
+                if not self.loop:
+                    self.finished = True
+                    return
+                index, frame = 0, self._read_video_frame(0)
+        if frame is None:
+            self._index = index  # Unreadable image or no frame at all, keeps showing the previous frame
+            return
+
+        self._frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+        self._index = index
+
+    def _read_video_frame(self, index: int):
+        # Decodes forward to index, seeking only when going back (loop restart)
+        if index <= self._video_index:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._video_index = index - 1
+        while self._video_index < index - 1:  # Skip frames that weren't due, without decoding their pixels
+            if not self._video.grab():
+                return None
+            self._video_index += 1
+        ok, frame = self._video.read()
+        if not ok:
+            return None
+        self._video_index = index
+        return frame
+
+
+# Name used in the capture_source config key -> source class
+CAPTURE_SOURCES = {
+    MssCaptureSource.name: MssCaptureSource,
+    ReplayCaptureSource.name: ReplayCaptureSource,
+}
+
+
+def create_capture_source(name: str = MssCaptureSource.name, **options) -> CaptureSource:
+    # options go to the source's constructor, e.g. path and speed for replays
+    if name not in CAPTURE_SOURCES:
+        raise ValueError(f"Unknown capture source: {name}")
+    return CAPTURE_SOURCES[name](**options)
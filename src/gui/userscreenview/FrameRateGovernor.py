@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+
+class FrameRateGovernor:
+    # Picks the delay until the next capture: max_fps while the screen changes, idle_fps once nothing moved for
+    # idle_after seconds, and never more capture work than cpu_budget (fraction of one core) allows.
+    def __init__(
+        self,
+        max_fps: float = 30,
+        idle_fps: float = 2,
+        cpu_budget: float = 0.25,
+        idle_after: float = 1.0,
+        motion_threshold: float = 2.0,
+        sample_step: int = 8,
+    ):
+        self.max_fps = max_fps
+        self.idle_fps = idle_fps
+        self.cpu_budget = cpu_budget
+        self.idle_after = idle_after
+        self.motion_threshold = motion_threshold  # Mean absolute difference of the sampled pixels
+        self.sample_step = sample_step  # Every sample_step-th pixel in both directions, green channel only
+
+        self._previous_sample = None
+        self._last_motion = time.perf_counter()
+        self._capture_seconds = 0.0  # Moving average of the work per capture
+
+    def wake(self):
+        # Back to the full rate right away, e.g. after the region changed
+        self._previous_sample = None
+        self._last_motion = time.perf_counter()
+
+    def observe(self, frame: np.ndarray) -> bool:
+        # Strided subsample diff of the green channel against the previous frame (RGB or BGRA), True if it moved
+        sample = frame[:: self.sample_step, :: self.sample_step, 1].astype(np.int16)
+        previous, self._previous_sample = self._previous_sample, sample
+        if previous is None or previous.shape != sample.shape:
+            return True
+
+        moving = float(np.abs(sample - previous).mean()) > self.motion_threshold
+        if moving:
+            self._last_motion = time.perf_counter()
+        return moving
+
+    def next_interval(self, capture_seconds: float) -> float:
+        # Seconds from this capture's start to the next one
+        self._capture_seconds += 0.2 * (capture_seconds - self._capture_seconds)
+        interval = 1 / (min(self.idle_fps, self.max_fps) if self.is_idle() else self.max_fps)
+        return max(interval, self._capture_seconds / self.cpu_budget)
+
+    def is_idle(self) -> bool:
+        return time.perf_counter() - self._last_motion >= self.idle_after
@@ -0,0 +1,91 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.core.dataclasses.CapturedFrame import CapturedFrame
+from src.core.enums.DropPolicy import DropPolicy
+
+
+class FrameRingBuffer:
+    # Fixed number of preallocated frame slots, written by the capture thread and read by the GUI thread.
+    # A frame is unread until a consumer asks for the latest one; slots held by a consumer are never overwritten.
+    def __init__(self, capacity: int = 4, policy: DropPolicy = DropPolicy.DROP_OLDEST):
+        if capacity < 2:
+            raise ValueError("FrameRingBuffer needs at least 2 slots")
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._slots: list[np.ndarray | None] = [None] * capacity
+        self._origins = [(0, 0)] * capacity
+        self._timestamps = [0.0] * capacity
+        self._numbers = [0] * capacity  # Frame number held by each slot, 0 when empty
+        self._holds = [0] * capacity
+        self._written = 0
+        self._read = 0
+        self._write_slot = None
+
+    def acquire_slot(self, shape: tuple[int, int, int]) -> np.ndarray | None:
+        # Slot the next frame is written into, None if the frame has to be dropped. Slots are only reallocated
+        # when the frame shape changes (e.g. a new region).
+        with self._lock:
+            unread = self._written - self._read
+            if self.policy is DropPolicy.DROP_NEWEST and unread >= self.capacity - 1:
+                self.dropped += 1
+                return None
+
+            # Oldest slot that no consumer holds
+            free = [i for i in range(self.capacity) if not self._holds[i]]
+            if not free:
+                self.dropped += 1
+                return None
+            index = min(free, key=lambda i: self._numbers[i])
+            if self._numbers[index] > self._read:
+                self.dropped += 1  # Overwriting a frame nobody has seen
+
+            slot = self._slots[index]
+            if slot is None or slot.shape != tuple(shape):
+                slot = self._slots[index] = np.empty(shape, dtype=np.uint8)
+            self._numbers[index] = 0  # Not readable while being written
+            self._write_slot = index
+            return slot
+
+    def commit(self, origin: tuple[int, int], timestamp: float) -> int:
+        # Publishes the frame written into the last acquired slot, returns its frame number
+        with self._lock:
+            index = self._write_slot
+            self._written += 1
+            self._numbers[index] = self._written
+            self._origins[index] = origin
+            self._timestamps[index] = timestamp
+            self._write_slot = None
+            return self._written
+
+    @contextmanager
+    def latest(self):
+        # Holds the newest frame for the duration of the with block, yields None if nothing was captured yet.
+        # The image is not copied: consumers that keep it past the block must copy it themselves.
+        frame = self._hold_latest()
+        try:
+            yield frame
+        finally:
+            if frame is not None:
+                with self._lock:
+                    self._holds[frame.slot] -= 1
+
+    def _hold_latest(self) -> CapturedFrame | None:
+        with self._lock:
+            index = max(range(self.capacity), key=lambda i: self._numbers[i])
+            number = self._numbers[index]
+            if not number:
+                return None
+            self._holds[index] += 1
+            self._read = max(self._read, number)
+            return CapturedFrame(self._slots[index], self._origins[index], number, self._timestamps[index], index)
+
+    def clear(self):
+        with self._lock:
+            self._numbers = [0] * self.capacity
+            self._read = self._written
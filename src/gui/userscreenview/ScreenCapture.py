@@ -1,25 +1,59 @@
+import contextlib
 import os
+import threading
+import time
 
 import cv2
 import numpy as np
-import mss
-from PySide6.QtCore import QTimer, QObject, Signal
+from PySide6.QtCore import QObject, Signal
 
+from src.core.enums.DropPolicy import DropPolicy
+from src.gui.userscreenview.CaptureSources import CaptureSource, MssCaptureSource, create_capture_source
+from src.gui.userscreenview.FrameRateGovernor import FrameRateGovernor
+from src.gui.userscreenview.FrameRingBuffer import FrameRingBuffer
 from src.logger.AppLogger import AppLogger
 from src.utils import utils
 
 
 class ScreenCapture(QObject):
-    frameCaptured = Signal(np.ndarray)
-
-    def __init__(self, parent=None):
+    # Number of the frame just written to the ring buffer, emitted from the capture thread.
+    # Consumers read it with `with screen_capture.frames.latest() as frame`.
+    frameCaptured = Signal(int)
+    # Effective capture rate (fps) and work per capture (ms), emitted about twice a second while recording
+    captureStatsUpdated = Signal(float, float)
+    _save_lock = threading.Lock()
+    ROI_MARGIN = 20  # Pixels grabbed around the selected region so the overlay border stays visible
+
+    def __init__(
+        self,
+        parent=None,
+        drop_policy: DropPolicy = DropPolicy.DROP_OLDEST,
+        buffer_size: int = 4,
+        cpu_budget: float = 0.25,
+        source: str = MssCaptureSource.name,
+        source_options: dict | None = None,
+    ):
         super().__init__(parent)
-        self._sct = mss.mss()  # Screen capture instance
+        # Where frames come from (screen or replay, see CaptureSources.py), this instance serves the GUI thread
+        self._source_name, self._source_options = source, source_options or {}
+        try:
+            self.source: CaptureSource = create_capture_source(source, **self._source_options)
+        except Exception as e:
+            if source == MssCaptureSource.name:
+                raise
+            # E.g. a replay file that can't be decoded, the screen is still there to capture
+            AppLogger.warn(f"Capture source '{source}' unavailable, capturing the screen: {type(e).__name__} - {e}")
+            self._source_name, self._source_options = MssCaptureSource.name, {}
+            self.source = create_capture_source(MssCaptureSource.name)
         self._monitor = 1
-        self._fps = 30
-        self._timer = QTimer(self)
-        self._timer.setInterval(self._fps)
-        self._timer.timeout.connect(self._capture_screen)
+        self._governor = FrameRateGovernor(max_fps=30, cpu_budget=cpu_budget)  # Adapts the rate to screen activity
+        self._region = None  # Monitor-relative (x, y, w, h), live capture grabs only this area when set
+        self._full_preview = False
+
+        # Live capture runs on its own thread and writes into preallocated frames
+        self.frames = FrameRingBuffer(buffer_size, drop_policy)
+        self._capture_thread = None
+        self._stop_event = threading.Event()
 
     def set_monitor(self, index: int):
         self._monitor = index
@@ -28,49 +62,174 @@ class ScreenCapture(QObject):
     def get_monitor(self) -> int:
         return self._monitor
 
+    def set_region(self, region):
+        self._region = region
+        self._governor.wake()
+
+    def set_full_preview(self, enabled: bool):
+        # Grab the whole monitor even when a region is selected, e.g. to pick a new region from the live view
+        self._full_preview = enabled
+        AppLogger.debug(f"Full monitor preview: {enabled}")
+
     def set_fps(self, fps):
-        self._fps = fps
-        update_ms = self._fps_to_ms(fps)
-        self._timer.setInterval(update_ms)
-        AppLogger.debug(f"Set update rate to: {update_ms} ms")
+        # Rate while the screen changes, the governor backs off to its idle rate when nothing moves
+        self._governor.max_fps = fps  # Picked up by the capture thread on its next tick
+        AppLogger.debug(f"Set max update rate to: {self._fps_to_ms(fps)} ms")
+
+    def is_recording(self) -> bool:
+        return self._capture_thread is not None and self._capture_thread.is_alive()
 
     def start_recording(self):
-        self._timer.start()
+        if self.is_recording():
+            if self._stop_event.is_set():
+                # Clearing the event now would revive the old worker next to the new one
+                AppLogger.warn("Previous screen capture is still stopping, not starting a new one")
+            return
+        self._stop_event.clear()
+        self._capture_thread = threading.Thread(target=self._capture_loop)
+        self._capture_thread.daemon = True
+        self._capture_thread.start()
         AppLogger.debug("Started screen capture")
 
     def stop_recording(self):
-        self._timer.stop()
+        self._stop_event.set()
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=1)
+            if self._capture_thread.is_alive():
+                AppLogger.warn("Screen capture thread didn't stop within 1 s, it exits after its current grab")
+            else:
+                self._capture_thread = None
+        self.frames.clear()
         AppLogger.debug("Stopped screen capture")
 
-    def capture_static_image(self, x, y, w, h):
-        img_path = os.path.normpath(os.path.join(utils.get_temp_dir(), "DRSSimg.png"))
-        monitor = {"top": y, "left": x, "width": w, "height": h}
-
-        screenshot = self._sct.grab(monitor)  # Capture the selected region
-        img = np.array(screenshot)  # Convert to NumPy array
-        # img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    def capture_region(self, x, y, w, h) -> np.ndarray:
+        # Capture the selected region (monitor-relative like the live capture's) and return it as an RGB NumPy array
+        # (no disk round trip)
+        monitors = self.source.monitors()
+        monitor = monitors[min(self._monitor, len(monitors) - 1)]
+        area = {"top": monitor["top"] + y, "left": monitor["left"] + x, "width": w, "height": h}
+
+        img = self._snapshot_grab(area)  # Capture the selected region
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
+
+    def monitor_snapshot(self, max_age: float = 0.5) -> np.ndarray:
+        # Whole selected monitor as BGRA. Reuses the newest live frame when it is a full-monitor grab (full preview
+        # or no region) at most max_age seconds old, grabs the screen otherwise.
+        monitors = self.source.monitors()
+        monitor = monitors[min(self._monitor, len(monitors) - 1)]
+        with self.frames.latest() as frame:
+            if (
+                frame is not None
+                and frame.origin == (0, 0)
+                and frame.image.shape[:2] == (monitor["height"], monitor["width"])
+                and time.perf_counter() - frame.timestamp <= max_age
+            ):
+                return frame.image.copy()
+        return self._snapshot_grab(monitor)
+
+    def _snapshot_grab(self, area: dict) -> np.ndarray:
+        # Grabs from the GUI thread. While the capture thread runs it alone steps a replay, with speed 0 a snapshot
+        # would otherwise take a frame the live pipeline never sees.
+        return self.source.grab(area, advance=not self.is_recording())
 
-        cv2.imwrite(img_path, img)  # Save image to file
+    @staticmethod
+    def get_static_image_path():
+        return os.path.normpath(os.path.join(utils.get_temp_dir(), "DRSSimg.png"))
+
+    @classmethod
+    def save_image(cls, img: np.ndarray):
+        # Encode an RGB frame as PNG into the cache dir
+        img_path = cls.get_static_image_path()
+        with cls._save_lock:
+            cv2.imwrite(img_path, cv2.cvtColor(img, cv2.COLOR_RGB2BGR))  # Save image to file
         print(f"Saved chessboard image: {img_path}")
         return img_path
 
-    def _capture_screen(self):
-        # Capture the screen and emit the frame as a NumPy array
-        monitor = self._sct.monitors[self._monitor]
-        screen = self._sct.grab(monitor)
-
-        # Convert to NumPy array & RGB format
-        img = np.array(screen)
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
-
-        self.frameCaptured.emit(img)
-
-    @staticmethod
-    def get_monitor_list():
+    @classmethod
+    def save_image_async(cls, img: np.ndarray):
+        # Write the frame to disk on a worker thread so PNG encoding stays off the hot path
+        thread = threading.Thread(target=cls.save_image, args=(img,))
+        thread.daemon = True
+        thread.start()
+        return cls.get_static_image_path()
+
+    def _capture_area(self, source: CaptureSource):
+        # Area to grab and its origin relative to the monitor: the selected region plus a margin, clamped to
+        # the monitor, or the whole monitor when no region is selected or a full preview was requested
+        monitors = source.monitors()
+        monitor = monitors[min(self._monitor, len(monitors) - 1)]
+        if self._full_preview or not self._region:
+            return monitor, (0, 0)
+
+        x, y, w, h = self._region
+        left, top = max(x - self.ROI_MARGIN, 0), max(y - self.ROI_MARGIN, 0)
+        right = min(x + w + self.ROI_MARGIN, monitor["width"])
+        bottom = min(y + h + self.ROI_MARGIN, monitor["height"])
+        if right <= left or bottom <= top:
+            return monitor, (0, 0)
+
+        area = {
+            "left": monitor["left"] + left,
+            "top": monitor["top"] + top,
+            "width": right - left,
+            "height": bottom - top,
+        }
+        return area, (left, top)
+
+    def _capture_loop(self):
+        # Ticks on fixed perf_counter deadlines so a stalled consumer doesn't shift the cadence.
+        # Thread-bound sources (mss) get their own instance on the worker, shared ones stay open after the loop.
+        if self.source.thread_bound:
+            worker_source = create_capture_source(self._source_name, **self._source_options)
+        else:
+            worker_source = contextlib.nullcontext(self.source)
+        with worker_source as source:
+            next_tick = time.perf_counter()
+            last_error = None
+            self._governor.wake()
+            stats_start, stats_frames, stats_seconds = next_tick, 0, 0.0
+            while not self._stop_event.is_set():
+                start_time = time.perf_counter()
+                try:
+                    self._capture_screen(source)
+                    last_error = None
+                except Exception as e:
+                    if str(e) != last_error:  # Log a persistent failure once, not on every tick
+                        AppLogger.error(f"Screen capture failed: {type(e).__name__} - {e}")
+                    last_error = str(e)
+
+                capture_seconds = time.perf_counter() - start_time
+                stats_frames, stats_seconds = stats_frames + 1, stats_seconds + capture_seconds
+                if start_time - stats_start >= 0.5:
+                    fps = stats_frames / (time.perf_counter() - stats_start)
+                    self.captureStatsUpdated.emit(fps, stats_seconds * 1000 / stats_frames)
+                    stats_start, stats_frames, stats_seconds = time.perf_counter(), 0, 0.0
+
+                next_tick += self._governor.next_interval(capture_seconds)
+                delay = next_tick - time.perf_counter()
+                if delay < 0:
+                    next_tick = time.perf_counter()  # Fell behind: skip the missed ticks instead of bursting
+                else:
+                    self._stop_event.wait(delay)
+
+    def _capture_screen(self, source: CaptureSource):
+        # Capture the region of interest (or the whole monitor) straight into a ring buffer slot
+        area, origin = self._capture_area(source)
+        timestamp = time.perf_counter()
+        screen = source.grab(area)
+        self._governor.observe(screen)  # Green is channel 1 in BGRA as well
+
+        slot = self.frames.acquire_slot(screen.shape)
+        if slot is None:
+            return  # Dropped, consumers are behind
+        # Kept as BGRA: the preview draws it as is, only the board crop the recognizer needs is converted to RGB
+        np.copyto(slot, screen)
+
+        self.frameCaptured.emit(self.frames.commit(origin, timestamp))
+
+    def get_monitor_list(self):
         # Detect available monitors and return a list of monitor names
-        with mss.mss() as sct:
-            return [f"Monitor {i}" for i in range(1, len(sct.monitors))]
+        return [f"Monitor {i}" for i in range(1, len(self.source.monitors()))]
 
     @staticmethod
     def _fps_to_ms(fps):
@@ -1,19 +1,29 @@
 import cv2
 import numpy as np
-import mss
 from PySide6.QtWidgets import QDialog
-from PySide6.QtGui import QPainter, QPen, QBrush, QColor, QPixmap, QImage
-from PySide6.QtCore import Qt, QRect, QSize, QPoint
+from PySide6.QtGui import QPainter, QPen, QColor, QPixmap, QImage
+from PySide6.QtCore import Qt, QRect, QRectF, QSize
 from PySide6.QtGui import QGuiApplication
 
+from src.gui.userscreenview.CaptureSources import CaptureSource, create_capture_source
+
 
 class ScreenRegionSelector(QDialog):
-    def __init__(self, monitor_index: int = 1):
+    OVERLAY_ALPHA = 150  # Darkening of the screenshot behind the selection, as a black overlay's alpha
+
+    def __init__(
+        self,
+        monitor_index: int = 1,
+        capture_source: CaptureSource | None = None,
+        screenshot: np.ndarray | None = None,
+    ):
         super().__init__()
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
 
+        # Same source as the live capture (screen or replay), standalone use grabs the screen
+        self.capture_source = capture_source or create_capture_source()
         screens = QGuiApplication.screens()
-        mss_monitors = mss.mss().monitors  # Get list of available monitors
+        mss_monitors = self.capture_source.monitors()  # Get list of available monitors
 
         # Fix: Ensure index mapping between QScreen and mss
         self.qscreen_index = monitor_index - 1  # Convert mss index to QScreen index
@@ -30,38 +40,34 @@ class ScreenRegionSelector(QDialog):
         self.setGeometry(self.monitor_geometry)
         self.move(self.monitor_geometry.topLeft())
 
-        # Capture screen
-        self.screen = self.capture_screen()
+        # Dimmed screenshot, rendered once. screenshot is a BGRA grab of the monitor the caller already holds
+        # (ScreenCapture.monitor_snapshot), the source is only asked for one if it's missing.
+        self.screen = self.capture_screen(screenshot)
         self.start_pos = None
         self.end_pos = None
         self.selection_rect = QRect()
 
         self.line_thickness = 2
 
-    def capture_screen(self):
-        # Capture the selected monitor using mss and convert to QPixmap
-        with mss.mss() as sct:
-            monitor = sct.monitors[self.mss_monitor_index]
-            screen = sct.grab(monitor)
-
-            img = np.array(screen)
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
-
-            height, width, _ = img.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_RGB888)
+    def capture_screen(self, screenshot: np.ndarray | None = None):
+        # BGRA grab of the selected monitor -> darkened QPixmap, the overlay is baked in so repaints only copy pixels
+        if screenshot is None:
+            screenshot = self.capture_source.grab(self.capture_source.monitors()[self.mss_monitor_index])
+        dimmed = cv2.convertScaleAbs(screenshot, alpha=1 - self.OVERLAY_ALPHA / 255)
 
-            return QPixmap.fromImage(q_img)
+        height, width = dimmed.shape[:2]
+        q_img = QImage(dimmed.data, width, height, dimmed.strides[0], QImage.Format.Format_RGB32)
+        return QPixmap.fromImage(q_img)  # Copies the pixels, dimmed can go
 
     def paintEvent(self, event):
-        # Draw the screen overlay and selection rectangle
+        # Only the damaged part: the dimmed screenshot under it and the selection border crossing it
         painter = QPainter(self)
-        painter.drawPixmap(self.rect(), self.screen)
-
-        # Dark transparent overlay ONLY on selected monitor
-        painter.setBrush(QBrush(QColor(0, 0, 0, 150)))  # Semi-transparent black
-        painter.setPen(Qt.PenStyle.NoPen)
-        painter.drawRect(self.rect())
+        target = QRectF(event.rect())
+        # Window -> captured pixels, 1:1 on the device when the capture has the screen's resolution
+        scale_x = self.screen.width() / max(self.width(), 1)
+        scale_y = self.screen.height() / max(self.height(), 1)
+        source = QRectF(target.x() * scale_x, target.y() * scale_y, target.width() * scale_x, target.height() * scale_y)
+        painter.drawPixmap(target, self.screen, source)
 
         # Draw selection rectangle if user is selecting
         if not self.selection_rect.isNull():
@@ -69,28 +75,36 @@ class ScreenRegionSelector(QDialog):
             painter.setPen(QPen(QColor(255, 0, 0), self.line_thickness))  # Red border
             painter.drawRect(self.selection_rect)
 
+    def _set_selection(self, rect: QRect):
+        # Repaints the union of the old and the new selection, grown by the pen width the border straddles
+        damaged = self.selection_rect.united(rect)
+        self.selection_rect = rect
+        margin = self.line_thickness + 1
+        self.update(damaged.adjusted(-margin, -margin, margin, margin))
+
     def mousePressEvent(self, event):
         # Start selection
         if event.button() == Qt.MouseButton.LeftButton:
             self.start_pos = event.pos()
-            self.selection_rect = QRect(self.start_pos, QSize(0, 0))
-            self.update()
+            self._set_selection(QRect(self.start_pos, QSize(0, 0)))
 
     def mouseMoveEvent(self, event):
         # Update selection rectangle while dragging
         if self.start_pos:
             self.end_pos = event.pos()
-            self.selection_rect = QRect(self.start_pos, self.end_pos).normalized()
-            self.update()
+            self._set_selection(QRect(self.start_pos, self.end_pos).normalized())
 
     def mouseReleaseEvent(self, event):
         # Save the selected region and close the selector
         if event.button() == Qt.MouseButton.LeftButton:
+            # The captured image is mapped onto the window, map the selection back to captured pixels
+            scale_x = self.screen.width() / max(self.width(), 1)
+            scale_y = self.screen.height() / max(self.height(), 1)
             x, y, w, h = (
-                self.selection_rect.x(),
-                self.selection_rect.y(),
-                self.selection_rect.width(),
-                self.selection_rect.height(),
+                round(self.selection_rect.x() * scale_x),
+                round(self.selection_rect.y() * scale_y),
+                round(self.selection_rect.width() * scale_x),
+                round(self.selection_rect.height() * scale_y),
             )
             self.selected_region = (x, y, w, h)
             self.accept()
@@ -3,6 +3,7 @@ import threading
 import time
 
 import cv2
+import numpy as np
 from PySide6.QtWidgets import (
     QWidget,
     QLabel,
@@ -21,9 +22,15 @@ from PySide6.QtGui import QImage, QPixmap, QPainter, QPen
 from PySide6.QtCore import Qt, QRect, QTimer
 
 from src.CNNlayer.Rookception import Rookception
-from src.ChessEngine.stockfish.StockfishLayer import StockfishLayer
+from src.ChessEngine.stockfish.EngineWorker import EngineWorker
+from src.bot.BoardLocator import BoardLocator, refine_grid
+from src.bot.BoardTracker import BoardTracker
+from src.core.BoardChangeDetector import BoardChangeDetector
 from src.core.HotkeyListener import HotkeyListener
+from src.core.dataclasses.BoardGrid import BoardGrid
+from src.core.enums.DropPolicy import DropPolicy
 from src.core.enums.Hotkeys import Hotkey
+from src.gui.userscreenview.CaptureSources import ReplayCaptureSource
 from src.gui.userscreenview.ScreenCapture import ScreenCapture
 from src.gui.userscreenview.ScreenRegionSelector import ScreenRegionSelector
 from src.logger.AppLogger import AppLogger
@@ -37,17 +44,46 @@ class UserScreenView(QWidget):
 
         self.session_data = session_data
         self.session_data.selectedRegionChanged.connect(self.update_overlay)
+        self.session_data.selectedRegionChanged.connect(self._update_capture_region)
+        self.session_data.selectedRegionChanged.connect(self._invalidate_recognition_cache)
 
         self.hotkey_listener = hotkey_listener
         self.hotkey_listener.hotkeyTriggered.connect(self._hotkey_triggered)
 
         self._rookception: Rookception | None = None
-        self._engine: StockfishLayer | None = None
+        self._engine: EngineWorker | None = None
+        self._move_request = (0, 0.0)  # Id and start time of the newest engine request, older results are ignored
 
         # Screen Capture instance
-        self.screen_capture = ScreenCapture(self)
+        self.screen_capture = ScreenCapture(
+            self,
+            DropPolicy(self.session_data.capture_drop_policy),
+            cpu_budget=self.session_data.capture_cpu_budget,
+            source=self.session_data.capture_source,
+            source_options=self._capture_source_options(),
+        )
         self.screen_capture.frameCaptured.connect(self.update_live_screen)  # Listen for frames
-        self.last_frame = None
+        self.screen_capture.captureStatsUpdated.connect(self.update_capture_stats)
+        self.screen_capture.set_region(self.session_data.selected_region)
+        self._shown_frame = 0
+        self._detected_frame = 0  # Last frame fed to the tracker and the change detector
+        self._grid_fallback_region = None  # Region the grid refinement last failed on
+        self._preview_buffer = None  # Reused BGRA buffer the live frame is downsampled into
+
+        # Auto detection: recognition and engine search only run once the board changed and settled
+        self.change_detector = BoardChangeDetector(parent=self)
+        self.change_detector.boardSettled.connect(self.update_next_move)
+        self.screen_capture.frameCaptured.connect(self._detect_board_change)
+        self.session_data.autoDetectionChanged.connect(self._auto_detection_changed)
+
+        # Live frames follow the board when it moves a little (tracker). With auto detection on, a lost board is
+        # searched on the whole monitor, otherwise following stops and the region stays as the user selected it.
+        self.board_locator = BoardLocator()
+        self.board_tracker = BoardTracker()
+        self._following_board = False  # Region changes made by the tracker keep the board's caches
+        self._board_lost = False  # Following stopped until a region is selected or auto detection is turned on
+        self._last_board_search = 0.0
+        self._static_image = None
 
         self.main_layout = QVBoxLayout(self)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
@@ -61,6 +97,10 @@ class UserScreenView(QWidget):
         self.select_region_btn.clicked.connect(self._select_chessboard_region)
         self.screen_control_layout.addRow("Select Region:", self.select_region_btn)
 
+        self.detect_board_btn = QPushButton("Detect Chessboard")
+        self.detect_board_btn.clicked.connect(self._detect_chessboard_region)
+        self.screen_control_layout.addRow("Find Region:", self.detect_board_btn)
+
         self.monitor_selector = QComboBox()
         self.monitor_selector.addItems(self.screen_capture.get_monitor_list())
         self.monitor_selector.currentIndexChanged.connect(self.update_monitor)
@@ -70,13 +110,25 @@ class UserScreenView(QWidget):
         self.fps_selector.setRange(1, 60)
         self.fps_selector.setValue(10)
         self.fps_selector.valueChanged.connect(self.update_fps)
-        self.screen_control_layout.addRow("FPS (1-60):", self.fps_selector)
+        self.screen_capture.set_fps(self.fps_selector.value())
+        self.screen_control_layout.addRow("Max FPS (1-60):", self.fps_selector)
+
+        self.capture_stats_label = QLabel("N/A")
+        self.screen_control_layout.addRow("Capture Rate:", self.capture_stats_label)
 
         self.capture_checkbox = QCheckBox("Enable Screen Capture")
         self.capture_checkbox.setChecked(False)
         self.capture_checkbox.toggled.connect(self.toggle_screen_capture)
         self.screen_control_layout.addRow("Live Capture:", self.capture_checkbox)
 
+        self.full_preview_checkbox = QCheckBox("Show Full Monitor")
+        self.full_preview_checkbox.setChecked(False)
+        self.full_preview_checkbox.toggled.connect(self.screen_capture.set_full_preview)
+        self.screen_control_layout.addRow("Preview:", self.full_preview_checkbox)
+
+        self.change_detection_label = QLabel("Off")
+        self.screen_control_layout.addRow("Auto Detection:", self.change_detection_label)
+
         # Engine Control Panel
         self.engine_control_panel = QGroupBox("Engine Controls")
         self.engine_control_layout = QVBoxLayout(self.engine_control_panel)
@@ -115,6 +167,11 @@ class UserScreenView(QWidget):
 
         self.main_layout.addLayout(screen_capture_layout)
 
+    def _capture_source_options(self):
+        if self.session_data.capture_source == ReplayCaptureSource.name:
+            return {"path": self.session_data.replay_path, "speed": self.session_data.replay_speed}
+        return {}
+
     def resizeEvent(self, event):
         # Ensures the static image resizes when the window is resized
         super().resizeEvent(event)
@@ -135,61 +192,78 @@ class UserScreenView(QWidget):
         self._initialize(self.session_data)
 
     def _apply_config(self):
-        pass
+        self._auto_detection_changed(self.session_data.auto_detection)
 
     def _hotkey_triggered(self, hotkey: Hotkey):
         match hotkey:
             case Hotkey.MAKE_NEXT_MOVE:
                 self.update_next_move()
 
-    def _init_modules(self, model_path):
-        self._engine = StockfishLayer()
-        AppLogger.debug("Engine loaded")
-        self._rookception = Rookception(model_path)
-        AppLogger.debug("CNN loaded")
+    def _init_modules(self, model_path, cnn_backend):
+        self._rookception = Rookception(model_path, backend=cnn_backend)
+        AppLogger.debug(f"CNN loaded ({self._rookception.backend.name} backend)")
 
     def _initialize(self, session_data):
-        thread = threading.Thread(target=self._init_modules, args=(session_data.model_path,))
+        # The engine searches on its own thread, results come back as signals. It outlives hiding the view.
+        if self._engine is None:
+            self._engine = EngineWorker()
+            self._engine.engineReady.connect(lambda: AppLogger.debug("Engine loaded"))
+            self._engine.infoUpdated.connect(self._show_engine_info)
+            self._engine.moveFound.connect(self._show_next_move)
+
+        thread = threading.Thread(target=self._init_modules, args=(session_data.model_path, session_data.cnn_backend))
         thread.daemon = True
         thread.start()
 
-    def update_live_screen(self, img_arr):
-        # Update Label with the new screen frame and overlay selection
-        height, width, _ = img_arr.shape
-        bytes_per_line = 3 * width
-        q_img = QImage(img_arr.data, width, height, bytes_per_line, QImage.Format.Format_RGB888)
+    def update_live_screen(self, frame_number=0):
+        # Update Label with the newest captured frame and overlay selection, 0 redraws whatever frame is newest
+        if frame_number and frame_number <= self._shown_frame:
+            return  # A newer frame was already drawn, this notification queued up while the GUI was busy
+
+        label_size = self.live_screen_label.size()
+        with self.screen_capture.frames.latest() as frame:
+            if frame is None:
+                return
+            # Downsample to the label first, so the preview costs depend on the widget size and not the monitor
+            height, width, _ = frame.image.shape
+            scale = min(label_size.width() / width, label_size.height() / height)
+            preview_size = (max(int(width * scale), 1), max(int(height * scale), 1))
+            if self._preview_buffer is None or self._preview_buffer.shape[1::-1] != preview_size:
+                self._preview_buffer = np.empty((preview_size[1], preview_size[0], 4), dtype=np.uint8)
+            cv2.resize(frame.image, preview_size, dst=self._preview_buffer, interpolation=cv2.INTER_LINEAR)
+            origin = frame.origin
+            self._shown_frame = frame.number
+
+        # BGRA bytes are what Format_RGB32 expects on little-endian, so the QImage wraps the buffer without a copy
+        preview = self._preview_buffer
+        q_img = QImage(preview.data, preview.shape[1], preview.shape[0], preview.strides[0], QImage.Format.Format_RGB32)
         pixmap = QPixmap.fromImage(q_img)
 
-        # Draw overlay
+        # Draw overlay in preview coordinates
         if self.session_data.selected_region:
             painter = QPainter(pixmap)
-            painter.setPen(QPen(Qt.GlobalColor.red, 4))
+            painter.setPen(QPen(Qt.GlobalColor.red, 2))
             x, y, w, h = self.session_data.selected_region
-            painter.drawRect(QRect(x, y, w, h))
+            painter.drawRect(
+                QRect(
+                    round((x - origin[0]) * scale),
+                    round((y - origin[1]) * scale),
+                    round(w * scale),
+                    round(h * scale),
+                )
+            )
             painter.end()
 
-        self.live_screen_label.setPixmap(
-            pixmap.scaled(
-                self.live_screen_label.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation,
-            )
-        )
-        self.store_last_frame(img_arr)
+        self.live_screen_label.setPixmap(pixmap)
 
-    def update_static_captured_label(self):
+    def update_static_captured_label(self, img=None):
         # Display the static captured image of the selected region
-        if not self.session_data.temp_chessboard_image:
-            print("No captured image found.")
-            return
-
-        img_path = self.session_data.temp_chessboard_image
-        if not os.path.exists(img_path):
-            print(f"Image path does not exist: {img_path}")
-            return
+        if img is None:
+            img = self._load_static_captured_image()
+            if img is None:
+                return
+        self._static_image = img
 
-        img = cv2.imread(img_path)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)  # Convert from BGR to RGB
         height, width, _ = img.shape
         bytes_per_line = 3 * width
         q_img = QImage(img.data, width, height, bytes_per_line, QImage.Format.Format_RGB888)
@@ -203,23 +277,109 @@ class UserScreenView(QWidget):
             )
         )
 
-    def update_static_snapshot(self):
+    def _load_static_captured_image(self):
+        # Reuse the last in-memory capture and only fall back to the image cached on disk
+        if self._static_image is not None:
+            return self._static_image
+
+        if not self.session_data.temp_chessboard_image:
+            print("No captured image found.")
+            return None
+
+        img_path = self.session_data.temp_chessboard_image
+        if not os.path.exists(img_path):
+            print(f"Image path does not exist: {img_path}")
+            return None
+
+        img = cv2.imread(img_path)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)  # Convert from BGR to RGB
+
+    def update_static_snapshot(self, save_to_disk=True):
         if not self.session_data.selected_region:
             return
 
         x, y, w, h = self.session_data.selected_region
-        board_img_path = self.screen_capture.capture_static_image(x, y, w, h)
-        self.session_data.temp_chessboard_image = board_img_path
-        self.update_static_captured_label()
-        return board_img_path
+        board_img = self.screen_capture.capture_region(x, y, w, h)
+        if save_to_disk:
+            self.session_data.temp_chessboard_image = self.screen_capture.save_image_async(board_img)
+        self.update_static_captured_label(board_img)
+        return board_img
 
     def update_overlay(self, region):
         # Force a screen update when the region changes
         if region and self.capture_checkbox.isChecked():
-            self.update_live_screen(self.last_frame)
+            self.update_live_screen()
+
+    def _update_capture_region(self, region):
+        # Live capture only grabs the selected region (plus a margin) from now on
+        self.screen_capture.set_region(region)
+        if not self._following_board:
+            self.board_tracker.reset()
+            self.change_detector.reset()
+            self._board_lost = False
+
+    def _auto_detection_changed(self, enabled):
+        self.change_detector.reset()
+        if enabled and self._board_lost:
+            self.board_tracker.reset()
+            self._board_lost = False
+        self.change_detection_label.setText("Waiting for frames" if enabled else "Off")
+
+    def _detect_board_change(self, _frame_number):
+        # Follows the board on every live frame (BoardTracker), then runs the cheap frame difference while it stays
+        # put, boardSettled triggers update_next_move
+        region = self.session_data.selected_region
+        if not region:
+            return
+
+        with self.screen_capture.frames.latest() as frame:
+            if frame is None or frame.number <= self._detected_frame:
+                # Notifications queue up while the GUI thread is busy, feeding the newest frame again would count
+                # as a still frame and settle a board mid-animation
+                return
+            board_img = frame.crop(*region)
+            if board_img is None:
+                return  # Grabbed before the last region change
+            self._detected_frame = frame.number
+            shift = (0, 0) if self._board_lost else self.board_tracker.track(board_img)
+            if shift == (0, 0) and self.session_data.auto_detection:
+                self.change_detector.process(board_img)
+
+        if shift is None and not self.session_data.auto_detection:
+            # Covered (popup, game over dialog) or moved away: a search could pick another board-like area
+            self._board_lost = True
+            AppLogger.info("Lost track of the board, the selected region stays where it is")
+        elif shift is None:
+            # Moved too far or gone: the full search, at most once every 2 s
+            if time.perf_counter() - self._last_board_search > 2.0:
+                self._last_board_search = time.perf_counter()
+                self._detect_chessboard_region()
+        elif shift != (0, 0):
+            self._follow_board(*shift)
+
+        if self.session_data.auto_detection:
+            stats = self.change_detector.stats
+            self.change_detection_label.setText(
+                f"{stats['settled']} changes, {stats['frames_filtered']}/{stats['frames_seen']} frames filtered"
+            )
 
-    def store_last_frame(self, img_arr):
-        self.last_frame = img_arr
+    def _follow_board(self, dx, dy):
+        # Moves the selected region with the board (scroll, window move). The board itself didn't change, so the
+        # square grid, the recognition caches and the change detector stay valid.
+        x, y, w, h = self.session_data.selected_region
+        grid = self.session_data.board_grid
+        self._following_board = True
+        try:
+            self.session_data.selected_region = (x + dx, y + dy, w, h)
+        finally:
+            self._following_board = False
+        self.session_data.board_grid = grid
+
+    def _invalidate_recognition_cache(self, _region):
+        # Cached square results and the empty-square calibration belong to the old region
+        if self._rookception and not self._following_board:
+            self._rookception.invalidate_cache()
+            self._rookception.reset_empty_prefilter()
 
     def update_monitor(self, index):
         self.screen_capture.set_monitor(index + 1)
@@ -227,6 +387,10 @@ class UserScreenView(QWidget):
     def update_fps(self, value):
         self.screen_capture.set_fps(value)
 
+    def update_capture_stats(self, fps, capture_ms):
+        # Effective rate chosen by the frame-rate governor and the capture thread's work per frame
+        self.capture_stats_label.setText(f"{fps:.1f} fps, {capture_ms:.1f} ms/frame")
+
     def toggle_screen_capture(self, live):
         if live:
             self.live_screen_label.setVisible(True)
@@ -236,9 +400,12 @@ class UserScreenView(QWidget):
             self.live_screen_label.setVisible(False)
             self.static_screen_label.setVisible(True)
             self.screen_capture.stop_recording()
+            self.capture_stats_label.setText("N/A")
 
     def _select_chessboard_region(self):
-        selector = ScreenRegionSelector(self.screen_capture.get_monitor())
+        selector = ScreenRegionSelector(
+            self.screen_capture.get_monitor(), self.screen_capture.source, self.screen_capture.monitor_snapshot()
+        )
         result = selector.exec()
 
         if result == QDialog.DialogCode.Accepted:
@@ -246,26 +413,81 @@ class UserScreenView(QWidget):
             print("Selected Chessboard Area:", selected_area)
 
             if selected_area:
-                x, y, w, h = selected_area
-                img_path = self.screen_capture.capture_static_image(x, y, w, h)
                 self.session_data.selected_region = selected_area
-                self.session_data.temp_chessboard_image = img_path
-                self.update_static_captured_label()
+                self.update_static_snapshot()
+
+    def _detect_chessboard_region(self):
+        # Searches the whole monitor for the board grid (BoardLocator) and selects it
+        region = self.board_locator.locate(self.screen_capture.monitor_snapshot())
+        if not region:
+            AppLogger.warn("No chessboard found on the selected monitor")
+            return
+
+        AppLogger.info(f"Chessboard detected at {region}")
+        if region != self.session_data.selected_region:
+            self.session_data.selected_region = region
+            self.update_static_snapshot()
 
     def _on_get_next_move_clicked(self):
         self.update_next_move()
 
+    def _board_grid(self, board_img) -> BoardGrid:
+        # Square grid of the selected region, refined once per region. A failed refinement (e.g. a frame taken
+        # mid-animation) isn't cached, the equal-squares fallback is used for this image and the next one retries.
+        if self.session_data.board_grid is None:
+            height, width = board_img.shape[:2]
+            grid = refine_grid(board_img)
+            if grid is None:
+                if self._grid_fallback_region != self.session_data.selected_region:
+                    self._grid_fallback_region = self.session_data.selected_region  # Warn once per region
+                    AppLogger.warn("Chessboard grid not found in the selected region, splitting it into equal squares")
+                return BoardGrid.uniform(width, height)
+
+            AppLogger.debug(
+                f"Chessboard grid: offset ({grid.left:.1f}, {grid.top:.1f}), "
+                f"squares {grid.square_width:.2f}x{grid.square_height:.2f} px"
+            )
+            self.session_data.board_grid = grid
+        return self.session_data.board_grid
+
+    def _predict_from_live_frame(self, region):
+        # Recognizes the board straight from the newest live frame (no grab, no copy).
+        # Returns None when live capture is off or the frame doesn't cover the region.
+        if not self.screen_capture.is_recording():
+            return None
+
+        with self.screen_capture.frames.latest() as frame:
+            board_img = frame.crop_rgb(*region) if frame is not None else None
+        if board_img is None:
+            return None
+        return self._rookception.predict_board(board_img, self._board_grid(board_img))
+
     def update_next_move(self):
+        # Recognizes the board and hands it to the engine thread, the move arrives in _show_next_move.
+        # A board recognized while the engine still searches an older one stops that search.
         start_time = time.perf_counter()
         board_region = self.session_data.selected_region
-        if not self._rookception or not self._engine or not board_region:
+        if not self._rookception or not self._engine or not self._engine.is_ready() or not board_region:
             return
 
-        board_img_path = self.update_static_snapshot()
-
-        board_state = self._rookception.predict_board(board_img_path)
+        board_state = self._predict_from_live_frame(board_region)
+        if board_state is None:
+            # Keep the PNG encode off the hot path, the delayed refresh below persists the snapshot
+            board_img = self.update_static_snapshot(save_to_disk=False)
+            board_state = self._rookception.predict_board(board_img, self._board_grid(board_img))
         turn = utils.get_turn_from_play_as_white(self.session_data.play_as_white)
-        best_move = self._engine.get_next_move(board_state, turn)
+        self._move_request = (self._engine.request_search(board_state, turn), start_time)
+
+    def _show_engine_info(self, request_id, index, line):
+        # Best line so far of the running search
+        if request_id == self._move_request[0] and index == 1:
+            self.best_move_label.setText(f"{line.move} (depth {line.depth})")
+
+    def _show_next_move(self, request_id, best_move):
+        request, start_time = self._move_request
+        if request_id != request:
+            return  # Finished just before a newer board was requested
+
         print("best move: ", best_move)
         if best_move:
             self.session_data.next_move = best_move
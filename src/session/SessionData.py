@@ -3,11 +3,14 @@ from dataclasses import asdict
 from PySide6.QtCore import QObject, Signal
 from typing import Optional, Tuple
 
+from src.core.dataclasses.BoardGrid import BoardGrid
 from src.core.dataclasses.BotParams import BotParams
 from src.core.enums.Hotkeys import Hotkey
 
 
 class SessionData(QObject):
+    MIN_CAPTURE_CPU_BUDGET = 0.01  # FrameRateGovernor divides the capture time by the budget, 0 is no budget
+
     selectedRegionChanged = Signal(tuple)
     gameStateChanged = Signal(str)
     botEnabledChanged = Signal(bool)
@@ -27,6 +30,7 @@ class SessionData(QObject):
         self.bot_params: BotParams = BotParams()
         self.hotkeys: dict[Hotkey, str] = {}
         self._selected_region: Optional[Tuple[int, int, int, int]] = None
+        self._board_grid: Optional[BoardGrid] = None  # Refined square grid of the selected region
         self._play_as_white: bool = True
         self._game_state: str = "Not Started"
         self._bot_enabled: bool = False
@@ -34,6 +38,12 @@ class SessionData(QObject):
         self._engine_rating: int = 1200
         self._temp_chessboard_image: Optional[str] = None
         self._model_path: str = ""
+        self._cnn_backend: str = "numpy"
+        self._capture_drop_policy: str = "drop_oldest"
+        self._capture_cpu_budget: float = 0.25
+        self._capture_source: str = "mss"
+        self._replay_path: str = ""
+        self._replay_speed: float = 1.0
         self.__next_move: str = ""
 
     def emit_hotkeys_updated(self):
@@ -57,8 +67,18 @@ class SessionData(QObject):
     def selected_region(self, value: Tuple[int, int, int, int]):
         if self._selected_region != value:
             self._selected_region = value
+            self._board_grid = None  # Belongs to the old region, refined again on the next board image
             self.selectedRegionChanged.emit(value)
 
+    @property
+    def board_grid(self):
+        return self._board_grid
+
+    @board_grid.setter
+    def board_grid(self, value: Optional[BoardGrid]):
+        if self._board_grid != value:
+            self._board_grid = value
+
     @property
     def next_move(self):
         return self.__next_move
@@ -157,3 +177,58 @@ class SessionData(QObject):
     def model_path(self, value: str):
         if self._model_path != value:
             self._model_path = value
+
+    @property
+    def cnn_backend(self):
+        return self._cnn_backend
+
+    @cnn_backend.setter
+    def cnn_backend(self, value: str):
+        if self._cnn_backend != value:
+            self._cnn_backend = value
+
+    @property
+    def capture_drop_policy(self):
+        return self._capture_drop_policy
+
+    @capture_drop_policy.setter
+    def capture_drop_policy(self, value: str):
+        if self._capture_drop_policy != value:
+            self._capture_drop_policy = value
+
+    @property
+    def capture_cpu_budget(self):
+        return self._capture_cpu_budget
+
+    @capture_cpu_budget.setter
+    def capture_cpu_budget(self, value: float):
+        value = min(max(value, self.MIN_CAPTURE_CPU_BUDGET), 1.0)  # Fraction of the one core the capture thread uses
+        if self._capture_cpu_budget != value:
+            self._capture_cpu_budget = value
+
+    @property
+    def capture_source(self):
+        return self._capture_source
+
+    @capture_source.setter
+    def capture_source(self, value: str):
+        if self._capture_source != value:
+            self._capture_source = value
+
+    @property
+    def replay_path(self):
+        return self._replay_path
+
+    @replay_path.setter
+    def replay_path(self, value: str):
+        if self._replay_path != value:
+            self._replay_path = value
+
+    @property
+    def replay_speed(self):
+        return self._replay_speed
+
+    @replay_speed.setter
+    def replay_speed(self, value: float):
+        if self._replay_speed != value:
+            self._replay_speed = value
@@ -3,6 +3,8 @@ import os
 from PySide6.QtCore import QStandardPaths, QFile, QIODevice
 from numpy import ndarray
 
+from src.core.dataclasses.BoardState import BoardState
+
 
 def get_temp_dir():
     temp_loc = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.TempLocation)
@@ -14,9 +16,16 @@ def get_temp_dir():
 
 def get_model_path():
     # Extract the .h5 model from Qt Resources and return the path to use with TensorFlow
-    resource_path = ":/models/Rookception.h5"
-    temp_dir = get_temp_dir()
-    temp_model_path = os.path.join(temp_dir, "Rookception.h5")
+    model_path = extract_resource(":/models/Rookception.h5", "Rookception.h5")
+    if model_path:
+        # Weights exported at build time (see DeepRook.spec) let Rookception run without TensorFlow
+        extract_resource(":/models/Rookception.npz", "Rookception.npz")
+    return model_path
+
+
+def extract_resource(resource_path, file_name):
+    # Copy a file from Qt Resources into the cache dir and return its path
+    temp_path = os.path.join(get_temp_dir(), file_name)
 
     if not QFile.exists(resource_path):
         print(f"Resource not found: {resource_path}")
@@ -24,13 +33,13 @@ def get_model_path():
 
     file = QFile(resource_path)
     if file.open(QFile.OpenModeFlag.ReadOnly):
-        with open(temp_model_path, "wb") as temp_file:
+        with open(temp_path, "wb") as temp_file:
             temp_file.write(file.readAll())  # Extract to temp location
         file.close()
-        print(f"Model extracted to: {temp_model_path}")
-        return temp_model_path
+        print(f"Resource extracted to: {temp_path}")
+        return temp_path
     else:
-        print("Failed to open model resource file.")
+        print(f"Failed to open resource file: {resource_path}")
         return None
 
 
@@ -92,8 +101,12 @@ def convert_to_user_friendly_hotkey(keyboard_str: str) -> str:
     return " + ".join(converted_keys)
 
 
-def board_to_fen(board_state: ndarray, turn="w", castling_rights="KQkq", en_passant="-", halfmove="0", fullmove="1"):
-    # Convert board state (8x8 numpy array) into FEN string including castling rights and en passant
+def board_to_fen(
+    board_state: BoardState | ndarray, turn="w", castling_rights="KQkq", en_passant="-", halfmove="0", fullmove="1"
+):
+    # Convert board state (BoardState or 8x8 label array) into FEN string including castling rights and en passant
+    if isinstance(board_state, BoardState):
+        return f"{board_state.to_fen_board()} {turn} {castling_rights} {en_passant} {halfmove} {fullmove}"
 
     # Map CNN labels to chess symbols
     piece_map = {
@@ -141,21 +154,25 @@ def board_to_fen(board_state: ndarray, turn="w", castling_rights="KQkq", en_pass
     return fen
 
 
-def infer_castling_rights(board_state):
+def infer_castling_rights(board_state: BoardState | ndarray):
     rights = ""
+    if isinstance(board_state, BoardState):
+        square = board_state.label_at
+    else:
+        square = lambda row, col: board_state[row][col]  # noqa: E731
 
     # White king + rooks
-    if board_state[7][4] == "wK":
-        if board_state[7][0] == "wR":
+    if square(7, 4) == "wK":
+        if square(7, 0) == "wR":
             rights += "Q"
-        if board_state[7][7] == "wR":
+        if square(7, 7) == "wR":
             rights += "K"
 
     # Black king + rooks
-    if board_state[0][4] == "bK":
-        if board_state[0][0] == "bR":
+    if square(0, 4) == "bK":
+        if square(0, 0) == "bR":
             rights += "q"
-        if board_state[0][7] == "bR":
+        if square(0, 7) == "bR":
             rights += "k"
 
     if not rights.strip():
@@ -164,6 +181,44 @@ def infer_castling_rights(board_state):
     return rights
 
 
+def expand_fen_board(fen_board: str) -> list[str]:
+    # FEN piece placement -> 64 squares from a8 to h1 (rank by rank), "." for empty squares
+    squares = []
+    for symbol in fen_board.replace("/", ""):
+        squares.extend("." * int(symbol) if symbol.isdigit() else symbol)
+    return squares
+
+
+def square_name(index: int) -> str:
+    # Index into an expanded FEN board -> algebraic square, 0 is a8
+    return "abcdefgh"[index % 8] + str(8 - index // 8)
+
+
+def infer_move(before: list[str], after: list[str], color: str) -> str | None:
+    # UCI move of color ("w" or "b") that turns the expanded board before into after, None if the difference isn't
+    # a single move of that side. Captures, promotions, castling and en passant are covered, legality isn't checked.
+    # The other side may have moved too, as long as it didn't capture the moved piece.
+    own = str.isupper if color == "w" else str.islower
+    sources = [i for i in range(64) if own(before[i]) and not own(after[i])]
+    targets = [i for i in range(64) if own(after[i]) and after[i] != before[i]]
+    if len(sources) == 2 and len(targets) == 2:  # Castling, UCI writes it as the king's move
+        king = "K" if color == "w" else "k"
+        sources = [i for i in sources if before[i] == king]
+        targets = [i for i in targets if after[i] == king]
+    if len(targets) == 1 and len(sources) > 1:
+        # The other side captured one of our pieces since: the mover is the one that shows up on the target
+        # (or a pawn, promoting on the last rank)
+        promoting = targets[0] // 8 in (0, 7)
+        sources = [i for i in sources if before[i] == after[targets[0]] or (promoting and before[i].lower() == "p")]
+    if len(sources) != 1 or len(targets) != 1:
+        return None
+
+    move = square_name(sources[0]) + square_name(targets[0])
+    if before[sources[0]].lower() == "p" and after[targets[0]].lower() != "p":
+        move += after[targets[0]].lower()  # Promotion
+    return move
+
+
 def print_board(board, title=""):
     index_mapping = {i: 8 - i for i in range(8)}
 
@@ -183,6 +238,8 @@ def print_board(board, title=""):
         "empty": ".",
     }
 
+    if isinstance(board, BoardState):
+        board = board.labels()
     board = [[piece_map.get(piece, piece) for piece in row] for row in board]
 
     if title: